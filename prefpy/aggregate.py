@@ -1,5 +1,181 @@
 # Base class for all rank aggregation methods
 
+import numpy as np
+from . import util
+
+
+class RankingStats:
+    """
+    Sufficient statistics of a set of rankings, computed
+    once and shared by every aggregator (and breaking)
+    run on the same data. Each statistic is computed the
+    first time it is requested.
+    """
+
+    def __init__(self, rankings, alts_list):
+        """
+        Description:
+            Initializes the statistics of a set of rankings
+            over the given alternatives and computes the
+            index of every alternative in every ranking.
+        Parameters:
+            rankings:  a list of tuples where the lowest index of a
+                       tuple is the highest rank position
+            alts_list: the set of integer alternatives (a.k.a candidates)
+        """
+        self.rankings = rankings
+        self.alts = alts_list
+        self.n = len(rankings)
+        self.m = len(alts_list)
+        self.positions = util.get_positions(rankings, alts_list)
+        self._pairwise_counts = None
+        self._position_counts = None
+        self._adjacent_counts = None
+        self._position_indicators = None
+        self._orders = None
+
+    def get_pairwise_counts(self):
+        """
+        Description:
+            Returns the matrix whose entry (i, j) is the number
+            of rankings in which alternative i is ranked above
+            alternative j. Alternatives missing from a ranking
+            are not counted.
+        """
+        if self._pairwise_counts is None:
+            self._pairwise_counts = util.get_pairwise_counts(self.positions)
+        return self._pairwise_counts
+
+    def get_position_counts(self):
+        """
+        Description:
+            Returns the matrix whose entry (i, p) is the number
+            of rankings in which alternative i is at position p.
+        """
+        if self._position_counts is None:
+            rows, alts = np.nonzero(self.positions >= 0)
+            flat = alts * self.m + self.positions[rows, alts]
+            counts = np.bincount(flat, minlength=self.m * self.m)
+            self._position_counts = counts.reshape(self.m, self.m).astype(float)
+        return self._position_counts
+
+    def get_top_k_counts(self, k):
+        """
+        Description:
+            Returns the number of rankings in which each
+            alternative is among the first k positions.
+        Parameters:
+            k: the number of positions counted from highest rank
+        """
+        return np.sum(self.get_position_counts()[:, :k], axis=1)
+
+    def get_adjacent_counts(self):
+        """
+        Description:
+            Returns the matrix whose entry (i, j) is the number
+            of rankings in which alternative i is ranked
+            immediately above alternative j.
+        """
+        if self._adjacent_counts is None:
+            m = self.m
+            order = self.get_orders()
+            pairs = (order[:, :-1] >= 0) & (order[:, 1:] >= 0)
+            flat = order[:, :-1][pairs] * m + order[:, 1:][pairs]
+            counts = np.bincount(flat, minlength=m * m)
+            self._adjacent_counts = counts.reshape(m, m).astype(float)
+        return self._adjacent_counts
+
+    def get_orders(self):
+        """
+        Description:
+            Returns the array whose entry (r, p) is the index of
+            the alternative at position p of ranking r, or -1 if
+            no alternative is at that position.
+        """
+        if self._orders is None:
+            orders = np.full((self.n, self.m), -1, dtype=int)
+            rows, alts = np.nonzero(self.positions >= 0)
+            orders[rows, self.positions[rows, alts]] = alts
+            self._orders = orders
+        return self._orders
+
+    def get_breaking_counts(self, mask, block_size=None):
+        """
+        Description:
+            Returns the matrix whose entry (i, j) is the number
+            of rankings in which alternative i is ranked above
+            alternative j, weighted by the entry of the breaking
+            mask at the positions of i and j. Alternatives
+            missing from a ranking are not counted.
+        Parameters:
+            mask:       m by m matrix indexed by the positions of
+                        the higher and lower alternative (numpy ndarray)
+            block_size: number of rankings counted at a time (int)
+        """
+        m = self.m
+        if block_size is None:
+            block_size = max(1, 2**22 // max(1, m * m))
+        counts = np.zeros((m, m))
+        for start in range(0, self.n, block_size):
+            block = self.positions[start:start + block_size]
+            above = ((block[:, :, None] < block[:, None, :]) &
+                     (block[:, :, None] >= 0))
+            ranked = np.maximum(block, 0)
+            weights = mask[ranked[:, :, None], ranked[:, None, :]]
+            counts += np.sum(above * weights, axis=0)
+        return counts
+
+    def get_higher_position_counts(self, p):
+        """
+        Description:
+            Returns the matrix whose entry (i, j) is the number
+            of rankings in which alternative i is at position p
+            and alternative j is ranked below it.
+        Parameters:
+            p: position of the higher alternative
+        """
+        alts = self.get_orders()[:, p]
+        return self._sum_rows_by_alternative(alts, self.positions > p)
+
+    def _sum_rows_by_alternative(self, alts, rows):
+        """
+        Description:
+            Returns the matrix whose row i is the sum of the rows
+            of the given array for the rankings whose entry of
+            alts is alternative i. Rankings whose entry is -1
+            are skipped.
+        Parameters:
+            alts: alternative of each ranking (numpy ndarray)
+            rows: one row of m values per ranking (numpy ndarray)
+        """
+        counts = np.zeros((self.m, self.m))
+        ranked = np.nonzero(alts >= 0)[0]
+        if len(ranked) == 0:
+            return counts
+        # group the rankings by alternative and sum each group
+        ranked = ranked[np.argsort(alts[ranked], kind="mergesort")]
+        grouped = alts[ranked]
+        starts = np.flatnonzero(np.concatenate(([True], grouped[1:] != grouped[:-1])))
+        counts[grouped[starts]] = np.add.reduceat(rows[ranked].astype(float), starts, axis=0)
+        return counts
+
+    def get_position_indicators(self):
+        """
+        Description:
+            Returns the array whose entry (r, i, p) is 1 if
+            alternative i is at position p of ranking r, for
+            p < m, and whose entry (r, i, m) is 1 if alternative
+            i is missing from ranking r.
+        """
+        if self._position_indicators is None:
+            indicators = np.zeros((self.n, self.m, self.m + 1))
+            columns = np.where(self.positions >= 0, self.positions, self.m)
+            rows = np.arange(self.n)[:, None]
+            indicators[rows, np.arange(self.m), columns] = 1
+            self._position_indicators = indicators
+        return self._position_indicators
+
+
 class RankAggregator:
     """
     Base class and methods intended only for use
@@ -33,6 +209,24 @@ class RankAggregator:
         """
         raise NotImplementedError("Class must be extended to use")
 
+    def get_ranking_stats(self, rankings):
+        """
+        Description:
+            Returns the RankingStats of the given rankings, or
+            the given RankingStats itself, so that aggregators
+            accept either one.  An error is thrown if the
+            statistics are over other alternatives.
+        Parameters:
+            rankings: a list of tuples where the lowest index of a
+                      tuple is the highest rank position, or a
+                      RankingStats object
+        """
+        if isinstance(rankings, RankingStats):
+            if list(rankings.alts) != list(self.alts):
+                raise ValueError("RankingStats alternatives do not match the aggregator")
+            return rankings
+        return RankingStats(rankings, self.alts)
+
     def get_ranking(self, alt):
         """
         Description:
@@ -103,14 +103,15 @@ class EMMMixPLAggregator(aggregate.RankAggregator):
             Takes in a set of rankings and computes the model
             parameters for a mixture of Plackett-Luce models.
         Parameters:
-            rankings:   set of rankings to aggregate
+            rankings:   set of rankings to aggregate, or their RankingStats
             K:          number of mixture components to compute
             epsilon:    convergence condition threshold value for overall EM algorithm
             epsilon_mm: convergence condition threshold value for MM algorithm
             iters:      dict, iterations configuration for EM and MM algorithms
         """
-        x = rankings # shorter pseudonym for voting data
-        self.n = len(rankings) # number of votes
+        ranking_stats = self.get_ranking_stats(rankings)
+        x = ranking_stats.rankings # shorter pseudonym for voting data
+        self.n = ranking_stats.n # number of votes
 
         # "fixed" iterations type variables
         outer_iters = None
@@ -142,12 +143,8 @@ class EMMMixPLAggregator(aggregate.RankAggregator):
         else:
             raise ValueError("iters dict value for key \"type\" is invalid: " + str(iters_type))
 
-        # pre-compute the delta values
-        delta_i_j_s = np.empty((self.n, self.m, self.m + 1))
-        for i in range(self.n):
-            for j in range(self.m):
-                for s in range(self.m + 1):
-                    delta_i_j_s[i][j][s] = EMMMixPLAggregator.delta(x[i], j, s, self.m)
+        # the delta values are the position indicators of the rankings
+        delta_i_j_s = ranking_stats.get_position_indicators()
 
         # generate initial values for p and pi:
         p_h0 = np.random.rand(K, self.m)
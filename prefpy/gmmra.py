@@ -5,7 +5,6 @@
 import numpy as np
 from . import aggregate
 from . import plackettluce as pl
-from . import util
 
 
 class GMMPLAggregator(aggregate.RankAggregator):
@@ -28,39 +27,37 @@ class GMMPLAggregator(aggregate.RankAggregator):
     def _top(self, k):
         """
         Description:
-            Top k breaking
+            Top k breaking: the pairs whose higher alternative
+            is at one of the positions 0, ..., k-1
         Parameters:
             k: the number of alternatives to break from highest rank
         """
+        if k < 1:
+            raise ValueError("k smaller than 1")
         if k > self.m:
             raise ValueError("k larger than the number of alternatives")
+        pos = np.arange(self.m)
         G = np.ones((self.m, self.m))
-        #np.fill_diagonal(G, 0)  # erroneous code from prefpy
-        for i in range(self.m):
-            for j in range(self.m):
-                if i == j:
-                    continue
-                if i > k and j > k:
-                    G[i][j] = 0
+        G[(pos[:, None] >= k) & (pos[None, :] >= k)] = 0
+        np.fill_diagonal(G, 1)  # the diagonal is kept, as in _full
         return G
 
     def _bot(self, k):
         """
         Description:
-            Bottom k breaking
+            Bottom k breaking: the pairs whose alternatives are
+            both at one of the positions m-k, ..., m-1
         Parameters:
             k: the number of alternatives to break from lowest rank
         """
         if k < 2:
             raise ValueError("k smaller than 2")
-        G = np.ones((self.m, self.m))
+        if k > self.m:
+            raise ValueError("k larger than the number of alternatives")
+        pos = np.arange(self.m)
+        G = np.zeros((self.m, self.m))
+        G[(pos[:, None] >= self.m - k) & (pos[None, :] >= self.m - k)] = 1
         np.fill_diagonal(G, 0)
-        for i in range(self.m):
-            for j in range(self.m):
-                if i == j:
-                    continue
-                if i <= k and j <= k:
-                    G[i][j] = 0
         return G
 
     def _adj(self, k):
@@ -70,82 +67,242 @@ class GMMPLAggregator(aggregate.RankAggregator):
         Paramters:
             k: not used
         """
-        G = np.zeros((self.m, self.m))
-        for i in range(self.m):
-            for j in range(self.m):
-                if i == j+1 or j == i+1:
-                    G[i][j] =  1
-        return G
+        pos = np.arange(self.m)
+        return (np.abs(pos[:, None] - pos[None, :]) == 1).astype(float)
 
     def _pos(self, k):
         """
         Description:
-            Position k breaking
+            Position k breaking: the pairs whose higher
+            alternative is at position k-1, the k-th position
         Parameters:
             k: position k is used for the breaking
         """
-        if k < 2:
-            raise ValueError("k smaller than 2")
-        G = np.zeros((self.m, self.m))
-        for i in range(self.m):
-            for j in range(self.m):
-                if i == j:
-                    continue
-                if i < k or j < k:
-                    continue
-                if i == k or j == k:
-                    G[i][j] = 1
-        return G
+        if k < 1:
+            raise ValueError("k smaller than 1")
+        if k > self.m:
+            raise ValueError("k larger than the number of alternatives")
+        pos = np.arange(self.m)
+        G = (((pos[:, None] == k - 1) & (pos[None, :] > k - 1)) |
+             ((pos[None, :] == k - 1) & (pos[:, None] > k - 1)))
+        return G.astype(float)
 
-    def aggregate(self, rankings, breaking="full", k=None):
+    def _breakings(self):
+        """
+        Description:
+            Returns the breaking constructors by name. Each
+            returns the breaking as a mask over pairs of
+            positions: entry (p, q) is 1 if the pair of
+            alternatives at positions p and q is broken.
+        """
+        return { "full":     self._full,
+                 "top":      self._top,
+                 "bottom":   self._bot,
+                 "adjacent": self._adj,
+                 "position": self._pos }
+
+    def aggregate(self, rankings, breaking="full", k=None, solver="svd",
+                  gamma0=None, epsilon=1e-10, max_iters=10000):
         """
         Description:
             Takes in a set of rankings and computes the
             Plackett-Luce model aggregate ranking.
         Parameters:
-            rankings: set of rankings to aggregate
-            breaking: type of breaking to use
-            k:        number to be used for top, bottom, and position breakings
+            rankings:  set of rankings to aggregate, or their RankingStats
+            breaking:  type of breaking to use
+            k:         number to be used for top, bottom, and position breakings
+            solver:    "svd" for the full SVD of P, or "power" for power
+                       iteration on the Markov chain of P (see _power_null_vector)
+            gamma0:    starting gamma of the power iteration; by default the
+                       gamma of the previous call is used, if any
+            epsilon:   convergence condition threshold value of the power iteration
+            max_iters: maximum number of iterations of the power iteration
         """
 
-        breakings = { "full":     self._full,
-                      "top":      self._top,
-                      "bottom":   self._bot,
-                      "adjacent": self._adj,
-                      "position": self._pos }
+        breakings = self._breakings()
 
         if (k == None and (breaking != "full" != breaking != "position")):
             raise ValueError("k cannot be None for non-full or non-position breaking")
 
         break_mat = breakings[breaking](k)
-        P = np.zeros((self.m, self.m))
-        for ranking in rankings:
-            localP = np.zeros((self.m, self.m))
-            for ind1, alt1 in enumerate(self.alts):
-                for ind2, alt2 in enumerate(self.alts):
-                    if ind1 == ind2:
-                        continue
-                    alt1_rank = util.get_index_nested(ranking, alt1)
-                    alt2_rank = util.get_index_nested(ranking, alt2)
-                    if alt1_rank < alt2_rank: # alt 1 is ranked higher
-                        localP[ind1][ind2] = 1
-            for ind, alt in enumerate(self.alts):
-                localP[ind][ind] = -1*(np.sum(localP.T[ind][:ind]) +
-                                       np.sum(localP.T[ind][ind+1:]))
-            localP *= break_mat
-            P += localP/len(rankings)
+
+        # the pairwise counts of the broken pairs of all rankings
+        ranking_stats = self.get_ranking_stats(rankings)
+        if breaking == "full":
+            counts = ranking_stats.get_pairwise_counts()
+        elif breaking == "adjacent":
+            counts = ranking_stats.get_adjacent_counts()
+        else:
+            counts = self._position_breaking_counts(ranking_stats, breaking, k)
+        P = self._moment_matrix(counts, ranking_stats.n)
         #epsilon = 1e-7
         #assert(np.linalg.matrix_rank(P) == self.m-1)
         #assert(all(np.sum(P, axis=0) <= epsilon))
-        U, S, V = np.linalg.svd(P)
-        gamma = np.abs(V[-1])
-        gamma /= np.sum(gamma)
+        if gamma0 is None:
+            gamma0 = getattr(self, "gamma", None)
+        gamma = self._null_vector(P, solver, gamma0, epsilon, max_iters)
         #assert(all(np.dot(P, gamma) < epsilon))
         alt_scores = {cand: gamma[ind] for ind, cand in enumerate(self.alts)}
         self.P = P
+        self.gamma = gamma
         self.create_rank_dicts(alt_scores)
         return gamma
 
+    def aggregate_sweep(self, rankings, breaking, ks, solver="svd",
+                        epsilon=1e-10, max_iters=10000):
+        """
+        Description:
+            Computes the Plackett-Luce parameters for each k of
+            a top, bottom or position breaking and returns them
+            in a dictionary keyed by k. The counts of the broken
+            pairs are accumulated from one k to the next, so the
+            whole sweep costs about one pass over the rankings.
+            With the power solver, each k starts from the gamma
+            of the previous one. The aggregate ranking is not
+            changed.
+        Parameters:
+            rankings:  set of rankings to aggregate, or their RankingStats
+            breaking:  "top", "bottom" or "position"
+            ks:        values of k to use
+            solver:    "svd" or "power", as in aggregate
+            epsilon:   convergence condition threshold value of the power iteration
+            max_iters: maximum number of iterations of the power iteration
+        """
+        if breaking not in ("top", "bottom", "position"):
+            raise ValueError("sweeps need a top, bottom or position breaking")
+        breakings = self._breakings()
+        for k in ks:
+            breakings[breaking](k) # validates k
+
+        ranking_stats = self.get_ranking_stats(rankings)
+        gammas = dict()
+        gamma = None
+        counts = np.zeros((self.m, self.m))
+        if breaking == "top":
+            # pairs whose higher alternative is at a position before k
+            next_pos = 0
+            for k in sorted(set(ks)):
+                while next_pos < k:
+                    counts += ranking_stats.get_higher_position_counts(next_pos)
+                    next_pos += 1
+                P = self._moment_matrix(counts, ranking_stats.n)
+                gamma = self._null_vector(P, solver, gamma, epsilon, max_iters)
+                gammas[k] = gamma
+        elif breaking == "bottom":
+            # pairs whose higher alternative is at a position from m-k on
+            next_pos = self.m - 1
+            for k in sorted(set(ks)):
+                while next_pos >= self.m - k:
+                    counts += ranking_stats.get_higher_position_counts(next_pos)
+                    next_pos -= 1
+                P = self._moment_matrix(counts, ranking_stats.n)
+                gamma = self._null_vector(P, solver, gamma, epsilon, max_iters)
+                gammas[k] = gamma
+        else:
+            for k in set(ks):
+                counts = ranking_stats.get_higher_position_counts(k - 1)
+                P = self._moment_matrix(counts, ranking_stats.n)
+                gamma = self._null_vector(P, solver, gamma, epsilon, max_iters)
+                gammas[k] = gamma
+        return gammas
+
+    def _position_breaking_counts(self, ranking_stats, breaking, k):
+        """
+        Description:
+            Returns the counts of the pairs broken by a top,
+            bottom or position breaking, summed from the counts
+            of the pairs whose higher alternative is at each of
+            the broken positions. This avoids looking up the
+            breaking mask for every pair of every ranking.
+        Parameters:
+            ranking_stats: RankingStats of the rankings
+            breaking:      "top", "bottom" or "position"
+            k:             number used for the breaking
+        """
+        if breaking == "top":
+            positions = range(0, k)
+        elif breaking == "bottom":
+            positions = range(self.m - k, self.m)
+        else:
+            positions = [k - 1]
+        counts = np.zeros((self.m, self.m))
+        for p in positions:
+            counts += ranking_stats.get_higher_position_counts(p)
+        return counts
+
+    def _moment_matrix(self, counts, n):
+        """
+        Description:
+            Returns the GMM moment matrix P of the breaking
+            counts, whose diagonal entries hold minus the number
+            of broken pairs each alternative lost, over n rankings.
+        Parameters:
+            counts: matrix of the counts of the broken pairs
+            n:      number of rankings
+        """
+        return (counts - np.diag(np.sum(counts, axis=0))) / n
+
+    def _null_vector(self, P, solver="svd", gamma0=None, epsilon=1e-10, max_iters=10000):
+        """
+        Description:
+            Returns the normalized null vector of the moment
+            matrix P, which is the estimate of gamma. The power
+            solver falls back to the SVD if it does not converge.
+        Parameters:
+            P:         moment matrix
+            solver:    "svd" or "power"
+            gamma0:    starting gamma of the power iteration
+            epsilon:   convergence condition threshold value of the power iteration
+            max_iters: maximum number of iterations of the power iteration
+        """
+        self.power_iters = None
+        if solver == "power":
+            gamma = self._power_null_vector(P, gamma0, epsilon, max_iters)
+            if gamma is not None:
+                return gamma
+        elif solver != "svd":
+            raise ValueError("solver must be \"svd\" or \"power\"")
+        U, S, V = np.linalg.svd(P)
+        gamma = np.abs(V[-1])
+        gamma /= np.sum(gamma)
+        return gamma
+
+    def _power_null_vector(self, P, gamma0, epsilon, max_iters):
+        """
+        Description:
+            Returns the null vector of P found by power iteration,
+            or None if it does not converge. Every column of P
+            sums to zero and its off-diagonal entries are not
+            negative, so P is the (transposed) rate matrix of a
+            Markov chain whose stationary distribution is gamma.
+            The chain is uniformized into the column-stochastic
+            matrix I + P / rate, which is multiplied into gamma
+            until the L1 change is below epsilon. The number of
+            iterations is stored in power_iters.
+        Parameters:
+            P:         moment matrix
+            gamma0:    starting gamma, or None for the uniform one
+            epsilon:   convergence condition threshold value
+            max_iters: maximum number of iterations
+        """
+        rate = np.max(-np.diag(P)) * 1.01 # a self-loop keeps the chain aperiodic
+        if not rate > 0:
+            return None
+        T = P / rate
+        T[np.diag_indices(self.m)] += 1
+
+        if gamma0 is None or len(gamma0) != self.m or not np.sum(np.abs(gamma0)) > 0:
+            gamma = np.ones(self.m) / self.m
+        else:
+            gamma = np.abs(gamma0) / np.sum(np.abs(gamma0))
+        for i in range(max_iters):
+            gamma_t1 = T.dot(gamma)
+            gamma_t1 /= np.sum(gamma_t1)
+            if np.sum(np.abs(gamma_t1 - gamma)) < epsilon:
+                self.power_iters = i + 1
+                return gamma_t1
+            gamma = gamma_t1
+        return None
 
 
 def main():
@@ -147,8 +147,9 @@ class MechanismPosScoring(Mechanism):
 
     def getMov(self, profile):
         """
-        Returns an integer that is equal to the margin of victory of the election profile, that is,
-        the number of votes needed to be changed to change to outcome into a draw.
+        Returns an integer that is an upper bound on the margin of victory of the election profile,
+        that is, the number of votes needed to be changed so that the winner is no longer the unique
+        winner. The bound is 0 if the profile already results in a draw.
 
         :ivar Profile profile: A Profile object that represents an election profile.
         """
@@ -299,8 +300,9 @@ class MechanismSimplifiedBucklin(Mechanism):
 
     def getMov(self, profile):
         """
-        Returns an integer that is equal to the margin of victory of the election profile, that is,
-        the number of votes needed to be changed to change to outcome into a draw.
+        Returns an integer that is an upper bound on the margin of victory of the election profile,
+        that is, the number of votes needed to be changed so that the winner is no longer the unique
+        winner. The bound is 0 if the profile already results in a draw.
 
         :ivar Profile profile: A Profile object that represents an election profile.
         """
@@ -354,6 +356,17 @@ class MechanismCopeland(Mechanism):
 
         return copelandScores
 
+    def getMov(self, profile):
+        """
+        Returns an integer that is an upper bound on the margin of victory of the election profile,
+        that is, the number of votes needed to be changed so that the winner is no longer the unique
+        winner. The bound is 0 if the profile already results in a draw.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+        from . import mov
+        return mov.movCopeland(profile, self.alpha)
+
 class MechanismMaximin(Mechanism):
     """
     The maximin mechanism.
@@ -392,6 +405,17 @@ class MechanismMaximin(Mechanism):
 
         return maximinScores
 
+    def getMov(self, profile):
+        """
+        Returns an integer that is an upper bound on the margin of victory of the election profile,
+        that is, the number of votes needed to be changed so that the winner is no longer the unique
+        winner. The bound is 0 if the profile already results in a draw.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+        from . import mov
+        return mov.movMaximin(profile)
+
 class MechanismSchulze(Mechanism):
     """
     The Schulze mechanism.
@@ -504,6 +528,17 @@ class MechanismSchulze(Mechanism):
 
         return betterCount
 
+    def getMov(self, profile):
+        """
+        Returns an integer that is an upper bound on the margin of victory of the election profile,
+        that is, the number of votes needed to be changed so that the winner is no longer the unique
+        winner. The bound is 0 if the profile already results in a draw.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+        from . import mov
+        return mov.movSchulze(profile)
+
 def getKendallTauScore(myResponse, otherResponse):
     """
     Returns the Kendall Tau Score
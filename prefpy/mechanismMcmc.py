@@ -7,12 +7,23 @@ import itertools
 import copy
 import random
 import json
+import multiprocessing
+import struct
+import time
+import numpy
+import stats
 from profile import Profile
 from preference import Preference
 from mechanism import Mechanism
 
 SAMPLESFILEMETADATALINECOUNT = 3
 
+# Binary sample files start with a header that holds the magic string, the number of candidates,
+# phi, the number of samples and the number of uint16 values in each sample row.
+SAMPLESFILEMAGIC = b"PREFMCMC"
+SAMPLESFILEHEADERFORMAT = "<8sIdQI"
+SAMPLESFILEHEADERSIZE = struct.calcsize(SAMPLESFILEHEADERFORMAT)
+
 class MechanismMcmc(Mechanism):
 
     def getWinners(self, profile, sampleFileName = None):
@@ -112,6 +123,212 @@ class MechanismMcmc(Mechanism):
 
         return utilities
 
+    def getChainSamples(self, wmg, V, numSamples, burnIn):
+        """
+        Advances a single chain from the sample V and returns its last sample and a
+        two-dimensional numpy array with the utility of each candidate, in increasing order of
+        their integer representations, for each of numSamples samples taken every n1 steps after
+        burnIn steps.
+
+        :ivar dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary that associates integer
+            representations of each pair of candidates, cand1 and cand2, with the number of times
+            cand1 is ranked above cand2 minus the number of times cand2 is ranked above cand1.
+        :ivar V: The current sample of the chain, or None to start from a new initial sample.
+        :ivar int numSamples: The number of samples to take.
+        :ivar int burnIn: The number of steps to take before the first sample.
+        """
+
+        cands = sorted(wmg.keys())
+        if V == None:
+            V = self.getInitialSample(wmg)
+        for i in range(0, burnIn):
+            V = self.sampleGenerator.getNextSample(V)
+
+        utilities = numpy.zeros((numSamples, len(cands)))
+        for i in range(0, numSamples):
+            for j in range(0, self.n1):
+                V = self.sampleGenerator.getNextSample(V)
+            for k in range(0, len(cands)):
+                utilities[i][k] = self.utilityFunction.getUtility([cands[k]], V)
+        return V, utilities
+
+    def getCandScoresMapParallel(self, profile, numChains = 4, numProcesses = None,
+                                 samplesPerCheck = None, maxRhat = 1.01, minEss = 400,
+                                 seed = None):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian utilities we approximate from several independent chains. Each chain is burned
+        in and then takes up to n2 samples every n1 steps. Every samplesPerCheck samples, the
+        split R-hat and the effective sample size of the utility of every candidate are computed
+        over all chains, and sampling stops as soon as every R-hat is at most maxRhat and every
+        effective sample size is at least minEss. The diagnostics of the last check are stored
+        in rhat, ess, numSamplesPerChain and converged.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar int numChains: The number of independent chains.
+        :ivar int numProcesses: The number of worker processes that advance the chains, or None
+            to advance them in this process.
+        :ivar int samplesPerCheck: The number of samples each chain takes between checks. By
+            default, the diagnostics are checked ten times.
+        :ivar float maxRhat: The largest split R-hat at which the chains are considered mixed.
+        :ivar float minEss: The smallest effective sample size at which sampling stops.
+        :ivar int seed: The seed of the first chain. Chain i is seeded with seed + i. If seed is
+            None, each chain is seeded from the random module.
+        """
+
+        wmg = profile.getWmg(True)
+        cands = sorted(wmg.keys())
+        if samplesPerCheck == None:
+            samplesPerCheck = max(2, int(math.ceil(self.n2/10.0)))
+
+        # The chains use both the random module and numpy.random, so we give every chain its own
+        # state of each generator and restore ours afterwards. Otherwise, worker processes forked
+        # from this one would all start from the same numpy state and run identical chains.
+        # Unseeded chain seeds are drawn before the states are saved, so that consecutive calls
+        # do not reuse them.
+        if seed != None:
+            chainSeeds = [seed + i for i in range(0, numChains)]
+        else:
+            chainSeeds = [random.randint(0, 2**32 - 1) for i in range(0, numChains)]
+        savedState = random.getstate()
+        savedNumpyState = numpy.random.get_state()
+        chainStates = []
+        for chainSeed in chainSeeds:
+            state = random.Random(chainSeed).getstate()
+            numpyState = numpy.random.RandomState(chainSeed % 2**32).get_state()
+            chainStates.append((None, state, numpyState))
+
+        pool = None
+        if numProcesses != None and numProcesses > 1:
+            pool = multiprocessing.Pool(numProcesses, initializer=_initMcmcWorker,
+                                        initargs=(self, wmg))
+        else:
+            _initMcmcWorker(self, wmg)
+
+        blocks = []
+        self.converged = False
+        self.numSamplesPerChain = 0
+        try:
+            while self.numSamplesPerChain < self.n2 and not self.converged:
+                numSamples = min(samplesPerCheck, self.n2 - self.numSamplesPerChain)
+                burnIn = self.burnIn if self.numSamplesPerChain == 0 else 0
+                tasks = [(V, state, numpyState, numSamples, burnIn)
+                         for V, state, numpyState in chainStates]
+                if pool != None:
+                    results = pool.map(_getMcmcChainBlock, tasks)
+                else:
+                    results = [_getMcmcChainBlock(task) for task in tasks]
+                chainStates = [result[:3] for result in results]
+                blocks.append(numpy.array([result[3] for result in results]))
+                self.numSamplesPerChain += numSamples
+
+                # The diagnostics need at least two samples in each half of every chain.
+                if self.numSamplesPerChain >= 4:
+                    draws = numpy.concatenate(blocks, axis=1)
+                    rhat = stats.split_rhat(draws)
+                    ess = stats.ess(draws)
+                    self.converged = bool(numpy.all(rhat <= maxRhat) and numpy.all(ess >= minEss))
+        finally:
+            if pool != None:
+                pool.terminate()
+            random.setstate(savedState)
+            numpy.random.set_state(savedNumpyState)
+
+        draws = numpy.concatenate(blocks, axis=1)
+        means = draws.mean(axis=(0, 1))
+        self.rhat, self.ess = dict(), dict()
+        utilities = dict()
+        for k in range(0, len(cands)):
+            utilities[cands[k]] = means[k]
+            if self.numSamplesPerChain >= 4:
+                self.rhat[cands[k]] = rhat[k]
+                self.ess[cands[k]] = ess[k]
+        return utilities
+
+    def getCandScoresMapAdaptive(self, profile, confidence = 0.95, separate = "winner",
+                                 samplesPerBatch = None, minBatches = 10, maxSeconds = None):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian utilities we approximate from a single chain, and a dictionary that associates
+        each candidate with the confidence interval of its utility. The chain is burned in and
+        then takes batches of samplesPerBatch samples every n1 steps. After minBatches batches,
+        the intervals are computed from the batch means after every batch, and sampling stops as
+        soon as the intervals separate the winner from the other candidates, or every candidate
+        from the next one in the ranking, when n2 samples were taken, or when maxSeconds seconds
+        have passed. The number of samples taken is stored in numSamples, and whether the
+        intervals separated the candidates is stored in separated.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar float confidence: The confidence level of each interval, between 0 and 1.
+        :ivar str separate: Either "winner" or "ranking".
+        :ivar int samplesPerBatch: The number of samples in each batch. By default, n2 samples
+            make a hundred batches.
+        :ivar int minBatches: The number of batches taken before the intervals are checked.
+        :ivar float maxSeconds: The time budget in seconds, or None for no budget.
+        """
+
+        if separate != "winner" and separate != "ranking":
+            print("ERROR: separate must be winner or ranking")
+            exit()
+
+        wmg = profile.getWmg(True)
+        cands = sorted(wmg.keys())
+        if samplesPerBatch == None:
+            samplesPerBatch = max(1, self.n2//100)
+        maxBatches = max(2, int(math.ceil(float(self.n2)/samplesPerBatch)))
+        minBatches = min(max(2, minBatches), maxBatches)
+
+        startTime = time.time()
+        V = self.getInitialSample(wmg)
+        burnIn = self.burnIn
+        batchMeans = []
+        self.separated = False
+        while len(batchMeans) < maxBatches:
+            V, utilities = self.getChainSamples(wmg, V, samplesPerBatch, burnIn)
+            burnIn = 0
+            batchMeans.append(utilities.mean(axis=0))
+            if len(batchMeans) < minBatches:
+                continue
+
+            means, halfWidths = stats.batch_means_interval(batchMeans, confidence)
+            self.separated = self.areCandScoresSeparated(means, halfWidths, separate)
+            if self.separated:
+                break
+            if maxSeconds != None and time.time() - startTime >= maxSeconds:
+                break
+
+        self.numSamples = len(batchMeans)*samplesPerBatch
+        utilities, intervals = dict(), dict()
+        for k in range(0, len(cands)):
+            utilities[cands[k]] = means[k]
+            intervals[cands[k]] = (means[k] - halfWidths[k], means[k] + halfWidths[k])
+        return utilities, intervals
+
+    def areCandScoresSeparated(self, means, halfWidths, separate):
+        """
+        Returns True if the confidence intervals of the scores separate the best candidate from
+        all other candidates, when separate is "winner", or every candidate from the next one in
+        the ranking, when separate is "ranking".
+
+        :ivar numpy.ndarray means: The score of each candidate.
+        :ivar numpy.ndarray halfWidths: The half-width of the confidence interval of each score.
+        :ivar str separate: Either "winner" or "ranking".
+        """
+
+        # We flip the scores if the best candidate minimizes its score.
+        if self.maximizeCandScore == True:
+            scores = numpy.asarray(means)
+        else:
+            scores = -numpy.asarray(means)
+        ranking = numpy.argsort(-scores, kind="mergesort")
+        lower = (scores - halfWidths)[ranking]
+        upper = (scores + halfWidths)[ranking]
+        if len(ranking) < 2:
+            return True
+        if separate == "winner":
+            return bool(lower[0] > upper[1:].max())
+        return bool(numpy.all(lower[:-1] > upper[1:]))
+
     def getWinnersBruteForce(self, profile):
         """
         Returns a list of all winning candidates when we use brute force to compute Bayesian
@@ -184,6 +401,13 @@ class MechanismMcmc(Mechanism):
 
         wmg = profile.getWmg(True)
 
+        # Binary sample files are recognized by their magic string.
+        sampleFile = open(sampleFileName, 'rb')
+        magic = sampleFile.read(len(SAMPLESFILEMAGIC))
+        sampleFile.close()
+        if magic == SAMPLESFILEMAGIC:
+            return self.getCandScoresMapFromBinarySamplesFile(profile, sampleFileName)
+
         # Initialize our list of expected utilities.
         utilities = dict()
         for cand in wmg.keys():
@@ -234,14 +458,132 @@ class MechanismMcmc(Mechanism):
             outFile.write("\n" + json.dumps(V))
         outFile.close()
 
+    def getSampleRow(self, sample):
+        """
+        Returns a flat list of integers that represents a sample in a binary sample file. By
+        default, samples are order vectors and are stored as they are.
+
+        :ivar list<int> sample: Contains integer representations of each candidate in order of
+            their ranking in a vote, from first to last.
+        """
+
+        return sample
+
+    def getSampleFromRow(self, row, numCands):
+        """
+        Returns the sample represented by a row of a binary sample file. By default, samples are
+        order vectors and are stored as they are.
+
+        :ivar numpy.ndarray row: A row of a binary sample file.
+        :ivar int numCands: The number of candidates.
+        """
+
+        return row.tolist()
+
+    def getRowsUtilities(self, rows, numCands, cands):
+        """
+        Returns a two-dimensional numpy array with the utility of each candidate, in the order of
+        cands, for the sample in each row of a binary sample file.
+
+        :ivar numpy.ndarray rows: A two-dimensional array of rows of a binary sample file.
+        :ivar int numCands: The number of candidates.
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        """
+
+        utilities = numpy.zeros((len(rows), len(cands)))
+        for i in range(0, len(rows)):
+            sample = self.getSampleFromRow(rows[i], numCands)
+            for k in range(0, len(cands)):
+                utilities[i][k] = self.utilityFunction.getUtility([cands[k]], sample)
+        return utilities
+
+    def printMcmcSamplesToBinaryFile(self, profile, numSamples, outFileName, blockSize = 4096):
+        """
+        Generate samples to a binary file. The file starts with a header that holds the number of
+        candidates, phi, the number of samples and the width of each sample row, followed by one
+        row of uint16 values per sample. Samples are written in blocks of blockSize rows.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar int numSamples: The number of samples to be generated.
+        :ivar str outFileName: The name of the file to be output.
+        :ivar int blockSize: The number of samples held in memory before they are written.
+        """
+
+        wmg = profile.getWmg(True)
+        V = self.getInitialSample(wmg)
+        rowWidth = len(self.getSampleRow(V))
+
+        outFile = open(outFileName, 'wb')
+        outFile.write(struct.pack(SAMPLESFILEHEADERFORMAT, SAMPLESFILEMAGIC, profile.numCands,
+                                  self.phi, numSamples, rowWidth))
+        block = numpy.zeros((blockSize, rowWidth), dtype="<u2")
+        for start in range(0, numSamples, blockSize):
+            numRows = min(blockSize, numSamples - start)
+            for i in range(0, numRows):
+                V = self.sampleGenerator.getNextSample(V)
+                block[i] = self.getSampleRow(V)
+            block[:numRows].tofile(outFile)
+        outFile.close()
+
+    def getCandScoresMapFromBinarySamplesFile(self, profile, sampleFileName, blockSize = 65536):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian utilities we approximate from the samples in a binary sample file. The file is
+        memory mapped, and the samples left after burn-in and thinning are read in blocks of
+        blockSize rows.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar str sampleFileName: The name of the input file containing the sample data.
+        :ivar int blockSize: The number of samples read from the file at a time.
+        """
+
+        sampleFile = open(sampleFileName, 'rb')
+        header = sampleFile.read(SAMPLESFILEHEADERSIZE)
+        sampleFile.close()
+        magic, numCands, phi, numRows, rowWidth = struct.unpack(SAMPLESFILEHEADERFORMAT, header)
+        if numCands != profile.numCands:
+            print("ERROR: sample file does not match the number of candidates")
+            exit()
+
+        # Initialize our list of expected utilities.
+        utilities = dict()
+        for cand in profile.candMap.keys():
+            utilities[cand] = 0.0
+
+        # Burn-in and thinning are applied by slicing the memory map, so skipped samples are
+        # never read.
+        rows = numpy.memmap(sampleFileName, dtype="<u2", mode='r', offset=SAMPLESFILEHEADERSIZE,
+                            shape=(numRows, rowWidth))
+        rows = rows[self.burnIn:self.burnIn + self.n2*self.n1:self.n1]
+        numSamples = len(rows)
+        cands = sorted(profile.candMap.keys())
+        totals = numpy.zeros(len(cands))
+        for start in range(0, numSamples, blockSize):
+            block = numpy.array(rows[start:start + blockSize], dtype=int)
+            totals += self.getRowsUtilities(block, numCands, cands).sum(axis=0)
+        del rows
+        for k in range(0, len(cands)):
+            utilities[cands[k]] = totals[k]/numSamples
+
+        return utilities
+
     #----------------------------------------------------------------------------------------------
 
 class MechanismMcmcMallows(MechanismMcmc):
     """
-    Implementation of the MCMC mechanism using the Mallows model.
+    Implementation of the MCMC mechanism using the Mallows model. When numChains is greater than
+    one, that many independent chains are advanced together, each is burned in, and the n2
+    samples are split evenly between them.
+
+    When warmStart is True, a single chain keeps its state between calls. The next profile
+    resumes the chain from its last sample with only reBurnIn steps of burn-in, and when the
+    profile or phi changed little, the samples kept from the last call are importance reweighted
+    instead of drawing new ones, as long as their effective sample size stays at least
+    minReweightEss times their number.
     """
 
-    def __init__(self, phi, lossFunction, n1, n2, burnIn, sampleGenerator):
+    def __init__(self, phi, lossFunction, n1, n2, burnIn, sampleGenerator, numChains = 1,
+                 warmStart = False, reBurnIn = None, minReweightEss = 0.5):
         self.maximizeCandScore = False
         self.phi = phi
         self.utilityFunction = lossFunction
@@ -249,6 +591,32 @@ class MechanismMcmcMallows(MechanismMcmc):
         self.n2 = n2
         self.burnIn = burnIn
         self.sampleGenerator = sampleGenerator
+        self.numChains = numChains
+        self.warmStart = warmStart
+        if reBurnIn == None:
+            reBurnIn = burnIn//10
+        self.reBurnIn = reBurnIn
+        self.minReweightEss = minReweightEss
+        self.chainState = None
+
+    def setPhi(self, phi):
+        """
+        Sets phi for the mechanism and its sample generator. A warm-started chain keeps its state,
+        so the next call reweights or resumes it under the new phi.
+
+        :ivar float phi: A value for phi such that 0 <= phi <= 1.
+        """
+
+        self.phi = phi
+        self.sampleGenerator.setPhi(phi)
+
+    def resetChainState(self):
+        """
+        Discards the state kept by a warm-started chain, so that the next call starts a new chain
+        with a full burn-in.
+        """
+
+        self.chainState = None
 
     def kendallTau(self, orderVector, wmgMap):
         """
@@ -269,6 +637,38 @@ class MechanismMcmcMallows(MechanismMcmc):
             discordantPairs = discordantPairs + max(0, wmgMap[i[1]][i[0]])
         return discordantPairs
 
+    def getKendallTaus(self, orders, wmg, blockSize = 4096):
+        """
+        Returns a numpy array with the kendall-tau distance, as computed by kendallTau(), of each
+        of several order arrays. The orders are compared with the wmg blockSize at a time.
+
+        :ivar numpy.ndarray orders: A two-dimensional array with one order array per row.
+        :ivar dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary that associates integer
+            representations of each pair of candidates, cand1 and cand2, with the number of times
+            cand1 is ranked above cand2 minus the number of times cand2 is ranked above cand1.
+        :ivar int blockSize: The number of orders compared at a time.
+        """
+
+        cands = sorted(wmg.keys())
+        m = len(cands)
+
+        # discordant[i][j] is the cost of ranking cands[i] above cands[j].
+        discordant = numpy.zeros((m, m))
+        for i in range(0, m):
+            for j in range(0, m):
+                if i != j:
+                    discordant[i][j] = max(0, wmg[cands[j]][cands[i]])
+
+        distances = numpy.zeros(len(orders))
+        for start in range(0, len(orders), blockSize):
+            block = orders[start:start + blockSize]
+            positions = numpy.zeros((len(block), max(cands) + 1), dtype=int)
+            positions[numpy.arange(len(block))[:, None], block] = numpy.arange(block.shape[1])
+            positions = positions[:, cands]
+            above = positions[:, :, None] < positions[:, None, :]
+            distances[start:start + len(block)] = (above*discordant).sum(axis=(1, 2))
+        return distances
+
     def getInitialSample(self, wmg):
         """
         Generate an initial sample for the Markov chain. This function will return a list 
@@ -282,41 +682,378 @@ class MechanismMcmcMallows(MechanismMcmc):
             dictionary represents a weighted majority graph for an election.
         """
         
-        V = copy.deepcopy(wmg.keys())
+        V = list(wmg.keys())
         random.shuffle(V)
         return V
 
-    def getCandScoresMapBruteForce(self, profile):
+    def getCandScoresMap(self, profile):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian losses we approximate from our sampling of the profile. The current sample is
+        held as an order array and a position array that the sample generator updates in place.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        if self.sampleGenerator.isExact():
+            return self.getCandScoresMapExact(profile)
+        if self.numChains > 1:
+            return self.getCandScoresMapMultiChain(profile)
+        if self.warmStart:
+            return self.getCandScoresMapWarmStart(profile)
+
+        wmg = profile.getWmg(True)
+        V, totals = self.getChainSamples(wmg, None, self.n2, self.burnIn, sumOnly=True)
+        return self.getUtilitiesMap(wmg, totals/self.n2)
+
+    def getUtilitiesMap(self, wmg, utilities):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with its
+        entry of utilities.
+
+        :ivar dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary whose keys are the
+            integer representations of the candidates.
+        :ivar numpy.ndarray utilities: The utility of each candidate, in increasing order of their
+            integer representations.
+        """
+
+        cands = sorted(wmg.keys())
+        utilitiesMap = dict()
+        for k in range(0, len(cands)):
+            utilitiesMap[cands[k]] = utilities[k]
+        return utilitiesMap
+
+    def getOrderUtilities(self, orders, cands):
+        """
+        Returns a two-dimensional numpy array with the utility of each candidate, in the order of
+        cands, for each of several order arrays, computed with a single call to the utility
+        function.
+
+        :ivar numpy.ndarray orders: A two-dimensional array with one order array per row.
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        """
+
+        positions = numpy.zeros((len(orders), max(cands) + 1), dtype=int)
+        positions[numpy.arange(len(orders))[:, None], orders] = numpy.arange(orders.shape[1])
+        return self.utilityFunction.getUtilitiesBatch(positions[:, cands], cands)
+
+    def getRowsUtilities(self, rows, numCands, cands):
+        """
+        Returns a two-dimensional numpy array with the loss of each candidate, in the order of
+        cands, for the order vector in each row of a binary sample file.
+
+        :ivar numpy.ndarray rows: A two-dimensional array of rows of a binary sample file.
+        :ivar int numCands: The number of candidates.
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        """
+
+        return self.getOrderUtilities(rows, cands)
+
+    def getChainSamples(self, wmg, V, numSamples, burnIn, sumOnly = False, blockSize = 1024):
+        """
+        Advances a single chain from the sample V and returns its last sample and a
+        two-dimensional numpy array with the loss of each candidate, in increasing order of
+        their integer representations, for each of numSamples samples taken every n1 steps after
+        burnIn steps. The chain is advanced on order and position arrays, and the losses are
+        computed for blocks of blockSize samples at a time.
+
+        :ivar dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary that associates integer
+            representations of each pair of candidates, cand1 and cand2, with the number of times
+            cand1 is ranked above cand2 minus the number of times cand2 is ranked above cand1.
+        :ivar list<int> V: The current sample of the chain, or None to start from a new initial
+            sample.
+        :ivar int numSamples: The number of samples to take.
+        :ivar int burnIn: The number of steps to take before the first sample.
+        :ivar bool sumOnly: If True, only the sum of the losses of each candidate over all samples
+            is returned, as a one-dimensional array.
+        """
+
+        cands = sorted(wmg.keys())
+        if V == None:
+            V = self.getInitialSample(wmg)
+        order = numpy.array(V)
+        position = self.sampleGenerator.getPositions(order)
+        for i in range(0, burnIn):
+            self.sampleGenerator.advance(order, position)
+
+        blocks = []
+        totals = numpy.zeros(len(cands))
+        block = numpy.zeros((min(blockSize, max(numSamples, 1)), len(order)), dtype=order.dtype)
+        for start in range(0, numSamples, len(block)):
+            numRows = min(len(block), numSamples - start)
+            for i in range(0, numRows):
+                for j in range(0, self.n1):
+                    self.sampleGenerator.advance(order, position)
+                block[i] = order
+            utilities = self.getOrderUtilities(block[:numRows], cands)
+            if sumOnly:
+                totals += utilities.sum(axis=0)
+            else:
+                blocks.append(utilities)
+
+        if sumOnly:
+            return order.tolist(), totals
+        if len(blocks) == 0:
+            return order.tolist(), numpy.zeros((0, len(cands)))
+        return order.tolist(), numpy.concatenate(blocks)
+
+    def getChainOrders(self, V, numSamples, burnIn):
+        """
+        Advances a single chain from the sample V and returns its last sample and a
+        two-dimensional numpy array with the order array of each of numSamples samples taken
+        every n1 steps after burnIn steps.
+
+        :ivar list<int> V: The current sample of the chain.
+        :ivar int numSamples: The number of samples to take.
+        :ivar int burnIn: The number of steps to take before the first sample.
+        """
+
+        order = numpy.array(V)
+        position = self.sampleGenerator.getPositions(order)
+        for i in range(0, burnIn):
+            self.sampleGenerator.advance(order, position)
+
+        orders = numpy.zeros((numSamples, len(order)), dtype=order.dtype)
+        for i in range(0, numSamples):
+            for j in range(0, self.n1):
+                self.sampleGenerator.advance(order, position)
+            orders[i] = order
+        return order.tolist(), orders
+
+    def getCandScoresMapWarmStart(self, profile):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian losses we approximate from a chain that is kept between calls. If the samples
+        kept from the last call can be reweighted to the profile, their weighted losses are
+        returned. Otherwise, the chain is resumed from its last sample, or started anew if the
+        candidates changed, and the new samples are kept in chainState.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        wmg = profile.getWmg(True)
+        cands = sorted(wmg.keys())
+        state = self.chainState
+
+        if state != None and state["cands"] == cands:
+            weights = self.getReweightingWeights(state, wmg)
+            if weights is not None:
+                return self.getUtilitiesMap(wmg, weights.dot(state["utilities"]))
+            V, burnIn = state["order"], self.reBurnIn
+        else:
+            V, burnIn = self.getInitialSample(wmg), self.burnIn
+
+        self.sampleGenerator.setWmg(wmg)
+        V, orders = self.getChainOrders(V, self.n2, burnIn)
+        utilities = numpy.zeros((self.n2, len(cands)))
+        for start in range(0, self.n2, 65536):
+            block = orders[start:start + 65536]
+            utilities[start:start + len(block)] = self.getOrderUtilities(block, cands)
+
+        self.chainState = {"cands": cands, "order": V, "wmg": wmg,
+                           "phi": self.sampleGenerator.phi, "orders": orders,
+                           "utilities": utilities, "kendallTaus": None}
+        return self.getUtilitiesMap(wmg, utilities.mean(axis=0))
+
+    def getReweightingWeights(self, state, wmg):
+        """
+        Returns a numpy array with the normalized importance weights that reweight the samples
+        kept in a chain state from the Mallows distribution they were drawn from to the one of the
+        given wmg and the current phi of the sample generator, or None if the effective sample
+        size of the weights is less than minReweightEss times the number of samples. The
+        effective sample size is kept in reweightEss.
+
+        :ivar dict state: The chain state kept from the last call.
+        :ivar dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary that associates integer
+            representations of each pair of candidates, cand1 and cand2, with the number of times
+            cand1 is ranked above cand2 minus the number of times cand2 is ranked above cand1.
+        """
+
+        phi = self.sampleGenerator.phi
+        if phi <= 0 or state["phi"] <= 0 or len(state["orders"]) == 0:
+            return None
+        if state["kendallTaus"] is None:
+            state["kendallTaus"] = self.getKendallTaus(state["orders"], state["wmg"])
+
+        # The normalizing constants of both distributions cancel once the weights are normalized.
+        logWeights = (self.getKendallTaus(state["orders"], wmg)*math.log(phi)
+                      - state["kendallTaus"]*math.log(state["phi"]))
+        weights = numpy.exp(logWeights - logWeights.max())
+        weights = weights/weights.sum()
+        self.reweightEss = 1.0/(weights**2).sum()
+        if self.reweightEss < self.minReweightEss*len(weights):
+            return None
+        return weights
+
+    def getCandScoresMapExact(self, profile):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian losses we approximate from n2 independent samples. This function assumes that
+        the sample generator draws independent samples, so there is no burn-in or thinning.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        wmg = profile.getWmg(True)
+        cands = sorted(wmg.keys())
+        totals = numpy.zeros(len(cands))
+        for start in range(0, self.n2, 65536):
+            orders = self.sampleGenerator.getSamples(min(65536, self.n2 - start))
+            totals += self.getOrderUtilities(orders, cands).sum(axis=0)
+        return self.getUtilitiesMap(wmg, totals/self.n2)
+
+    def getCandScoresMapMultiChain(self, profile):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian losses we approximate from numChains chains that are advanced together. The
+        samples of all chains after their burn-in are pooled.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        wmg = profile.getWmg(True)
+        orders = numpy.array([self.getInitialSample(wmg) for i in range(0, self.numChains)])
+        positions = numpy.array([self.sampleGenerator.getPositions(order) for order in orders])
+        samplesPerChain = int(math.ceil(float(self.n2)/self.numChains))
+
+        cands = sorted(wmg.keys())
+        totals = numpy.zeros(len(cands))
+
+        for i in range(0, self.burnIn):
+            self.sampleGenerator.advanceChains(orders, positions)
+
+        # The position arrays of the chains already hold the positions the losses are computed
+        # from.
+        for i in range(0, samplesPerChain):
+            for j in range(0, self.n1):
+                self.sampleGenerator.advanceChains(orders, positions)
+            totals += self.utilityFunction.getUtilitiesBatch(positions[:, cands], cands).sum(axis=0)
+
+        return self.getUtilitiesMap(wmg, totals/(samplesPerChain*self.numChains))
+
+    def getCandScoresMapBruteForce(self, profile, numProcesses = None, maxSuffixLength = 8):
         """
         Returns a dictonary that associates the integer representation of each candidate with the 
         bayesian losses that we calculate using brute force.
 
+        The rankings are enumerated in blocks that share their first m - r candidates, where r is
+        at most maxSuffixLength. Every block reuses one table of the r! orderings of the last r
+        candidates, so the kendall-tau distances and losses of a whole block are computed with
+        a few numpy operations, and the normalizer is accumulated in the same pass in log space.
+
         :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar int numProcesses: The number of worker processes that the blocks are split among,
+            or None to compute them in this process.
+        :ivar int maxSuffixLength: The largest number of candidates enumerated within a block.
         """
         
         wmg = profile.getWmg(True)
-        losses = dict()
-        for cand in wmg.keys():
-            losses[cand] = 0.0
+        cands = sorted(wmg.keys())
+        m = len(cands)
 
-        # Calculate the denominator.
-        denom = 0.0
-        for permutation in itertools.permutations(wmg.keys()):
-            denom = denom + self.phi ** float(self.kendallTau(permutation, wmg))
+        # costs[i][j] is what ranking cands[i] above cands[j] adds to the kendall-tau distance.
+        costs = numpy.zeros((m, m))
+        for i in range(0, m):
+            for j in range(0, m):
+                if i != j:
+                    costs[i][j] = max(0, wmg[cands[j]][cands[i]])
 
-        for permutation in itertools.permutations(wmg.keys()):
-            prob = self.phi**float(self.kendallTau(permutation, wmg))/denom
-            for cand in wmg.keys():
-                losses[cand] += self.utilityFunction.getUtility([cand], permutation)* prob
+        suffixLength = min(m, maxSuffixLength)
+        prefixes = list(itertools.permutations(range(0, m), m - suffixLength))
+        if numProcesses != None and numProcesses > 1:
+            pool = multiprocessing.Pool(numProcesses, initializer=_initMallowsBruteForceWorker,
+                                        initargs=(self, costs, cands, suffixLength))
+            try:
+                chunkSize = int(math.ceil(float(len(prefixes))/numProcesses))
+                chunks = [prefixes[i:i+chunkSize] for i in range(0, len(prefixes), chunkSize)]
+                results = pool.map(_getMallowsBruteForceSums, chunks)
+            finally:
+                pool.terminate()
+        else:
+            results = [self.getBruteForceSums(costs, cands, prefixes, suffixLength)]
+
+        # Combine the sums of every chunk, which are each scaled by their own largest weight.
+        logScale = max(result[0] for result in results)
+        totalWeight = 0.0
+        totals = numpy.zeros(m)
+        for chunkScale, chunkWeight, chunkTotals in results:
+            if chunkScale == -numpy.inf:
+                continue
+            totalWeight += chunkWeight*math.exp(chunkScale - logScale)
+            totals += chunkTotals*math.exp(chunkScale - logScale)
+
+        losses = dict()
+        for k in range(0, m):
+            losses[cands[k]] = totals[k]/totalWeight
         return losses
 
+    def getBruteForceSums(self, costs, cands, prefixes, suffixLength):
+        """
+        Returns the logarithm of a scale, and the sum of the weights phi^d and the sums of the
+        weighted losses of each candidate over every ranking that starts with one of the given
+        prefixes, both divided by the scale, where d is the kendall-tau distance of the ranking.
+
+        :ivar numpy.ndarray costs: costs[i][j] is what ranking cands[i] above cands[j] adds to the
+            kendall-tau distance.
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        :ivar list<tuple<int>> prefixes: The indices of the first candidates of each block.
+        :ivar int suffixLength: The number of candidates enumerated within each block.
+        """
+
+        m = len(cands)
+        prefixLength = m - suffixLength
+        logPhi = math.log(self.phi) if self.phi > 0 else -numpy.inf
+
+        # The positions of each candidate in every ordering of the suffix, and whether each
+        # candidate is above each other candidate, flattened so that the distances of a block are
+        # a single product with the flattened costs.
+        suffixOrders = numpy.array(list(itertools.permutations(range(0, suffixLength))))
+        numOrders = len(suffixOrders)
+        suffixPositions = numpy.zeros((numOrders, suffixLength), dtype=int)
+        suffixPositions[numpy.arange(numOrders)[:, None], suffixOrders] = \
+            numpy.arange(suffixLength)
+        isAbove = suffixPositions[:, :, None] < suffixPositions[:, None, :]
+        isAbove = isAbove.reshape((numOrders, suffixLength*suffixLength)).astype(float)
+
+        logScale = -numpy.inf
+        totalWeight = 0.0
+        totals = numpy.zeros(m)
+        positions = numpy.zeros((numOrders, m), dtype=int)
+        for prefix in prefixes:
+            rest = [i for i in range(0, m) if i not in prefix]
+            prefixCost = 0.0
+            for a in range(0, prefixLength):
+                for b in range(a+1, prefixLength):
+                    prefixCost += costs[prefix[a]][prefix[b]]
+                prefixCost += costs[prefix[a]][rest].sum()
+            blockCosts = prefixCost + isAbove.dot(costs[numpy.ix_(rest, rest)].ravel())
+            with numpy.errstate(invalid="ignore"):
+                logWeights = numpy.where(blockCosts > 0, blockCosts*logPhi, 0.0)
+
+            # Rescale the sums so far whenever a block has a larger weight than any before it.
+            blockScale = logWeights.max()
+            if blockScale == -numpy.inf:
+                continue
+            if blockScale > logScale:
+                if logScale != -numpy.inf:
+                    totalWeight *= math.exp(logScale - blockScale)
+                    totals *= math.exp(logScale - blockScale)
+                logScale = blockScale
+            weights = numpy.exp(logWeights - logScale)
+
+            positions[:, list(prefix)] = numpy.arange(prefixLength)
+            positions[:, rest] = prefixLength + suffixPositions
+            totalWeight += weights.sum()
+            totals += weights.dot(self.utilityFunction.getUtilitiesBatch(positions, cands))
+        return logScale, totalWeight, totals
+
 class MechanismMcmcCondorcet(MechanismMcmc):
     """
     Implementation of the MCMC mechanism using the Condorcet model. This was mostly adapted from 
     code by Lirong Xia.
     """
 
-    def __init__(self, phi, lossFunction, n1, n2, burnIn, sampleGenerator):
+    def __init__(self, phi, lossFunction, n1, n2, burnIn, sampleGenerator, maxExactSets = 1000000):
         self.maximizeCandScore = True
         self.phi = phi
         self.utilityFunction = lossFunction
@@ -324,6 +1061,7 @@ class MechanismMcmcCondorcet(MechanismMcmc):
         self.n2 = n2
         self.burnIn = burnIn
         self.sampleGenerator = sampleGenerator
+        self.maxExactSets = maxExactSets
 
     def createBinaryRelation(self, m):
         """
@@ -334,10 +1072,166 @@ class MechanismMcmcCondorcet(MechanismMcmc):
 
         binaryRelation = []
         for i in range(m):
-            binaryRelation.append(range(m))
+            binaryRelation.append(list(range(m)))
             binaryRelation[i][i] = 0
         return binaryRelation
 
+    def getCandScoresMap(self, profile):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian utilities of the profile. The utilities are computed exactly when the utility
+        function depends only on the number of candidates that reach the decision and at most
+        maxExactSets sets of candidates need to be considered, and are approximated by sampling
+        otherwise.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        candScoresMap = self.getCandScoresMapExact(profile)
+        if candScoresMap == None and self.sampleGenerator.isExact():
+            candScoresMap = self.getCandScoresMapFromSampleBlocks(profile)
+        elif candScoresMap == None:
+            candScoresMap = MechanismMcmc.getCandScoresMap(self, profile)
+        return candScoresMap
+
+    def getCandScoresMapFromSampleBlocks(self, profile, blockSize = 4096):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        Bayesian utilities we approximate from n2 independent samples, drawn in blocks of
+        blockSize samples. This function assumes that the sample generator draws independent
+        samples, so there is no burn-in or thinning.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar int blockSize: The number of samples drawn at a time.
+        """
+
+        cands = sorted(profile.candMap.keys())
+        totals = numpy.zeros(len(cands))
+        for start in range(0, self.n2, blockSize):
+            samples = self.sampleGenerator.getSamples(min(blockSize, self.n2 - start))
+            totals += self.utilityFunction.getUtilitiesBatchRelations(samples, cands).sum(axis=0)
+
+        utilities = dict()
+        for k in range(0, len(cands)):
+            utilities[cands[k]] = totals[k]/self.n2
+        return utilities
+
+    def getPairProbs(self, wmg):
+        """
+        Returns a two-dimensional list that contains, for each pair of candidates, cand1 and
+        cand2, in increasing order of their integer representations, the probability that cand1
+        is ranked above cand2.
+
+        :ivar dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary that associates integer
+            representations of each pair of candidates, cand1 and cand2, with the number of times
+            cand1 is ranked above cand2 minus the number of times cand2 is ranked above cand1.
+        """
+
+        cands = sorted(wmg.keys())
+        pairProbs = self.createBinaryRelation(len(cands))
+        for i in range(0, len(cands)):
+            for j in range(0, len(cands)):
+                if i != j:
+                    pairProbs[i][j] = 1/(1+self.phi ** float(wmg[cands[i]][cands[j]]))
+        return pairProbs
+
+    def getTopSetSizeProbs(self, pairProbs, cand, maxSize):
+        """
+        Returns a list whose s-th entry is the probability that exactly s candidates, including
+        cand, reach cand in the binary relation, for every s up to maxSize.
+
+        The candidates that reach cand are exactly the set A when every candidate in A is ranked
+        above every candidate outside of A, and every candidate in A reaches cand within A. The
+        pairs involved are disjoint, so the probability is the product of the probability of the
+        cut and Q(A), the probability that every candidate in A reaches cand within A. Q(A) is
+        one minus the probability that a smaller set B is cut off from the rest of A, summed over
+        the sets B that contain cand.
+
+        :ivar list<list<float>> pairProbs: The probability that each candidate is ranked above
+            each other candidate, indexed from 0.
+        :ivar int cand: The index of the candidate.
+        :ivar int maxSize: The largest number of candidates to consider.
+        """
+
+        numCands = len(pairProbs)
+        others = [other for other in range(0, numCands) if other != cand]
+        candBit = 1 << cand
+        allBits = (1 << numCands) - 1
+
+        def getCutProb(above, below):
+            prob = 1.0
+            for a in range(0, numCands):
+                if above >> a & 1:
+                    for b in range(0, numCands):
+                        if below >> b & 1:
+                            prob *= pairProbs[a][b]
+            return prob
+
+        reachProbs = dict()
+        sizeProbs = [0.0]*(maxSize+1)
+        for size in range(1, maxSize+1):
+            for comb in itertools.combinations(others, size-1):
+                topSet = candBit
+                for other in comb:
+                    topSet |= 1 << other
+
+                # Go through every proper subset of topSet that contains cand.
+                reachProb = 1.0
+                rest = topSet & ~candBit
+                if rest != 0:
+                    subset = (rest - 1) & rest
+                    while True:
+                        smallerSet = subset | candBit
+                        reachProb -= reachProbs[smallerSet]*getCutProb(smallerSet,
+                                                                       topSet & ~smallerSet)
+                        if subset == 0:
+                            break
+                        subset = (subset - 1) & rest
+                reachProbs[topSet] = reachProb
+                sizeProbs[size] += reachProb*getCutProb(topSet, allBits & ~topSet)
+        return sizeProbs
+
+    def getCandScoresMapExact(self, profile):
+        """
+        Returns a dictonary that associates the integer representation of each candidate with the 
+        exact Bayesian utilities of the profile, or None if the utility function does not depend
+        only on the number of candidates that reach the decision or if more than maxExactSets
+        sets of candidates would need to be considered.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        wmg = profile.getWmg(True)
+        cands = sorted(wmg.keys())
+        m = len(cands)
+        sizeUtilities = self.utilityFunction.getUtilitiesBySize(m)
+        if sizeUtilities == None:
+            return None
+
+        # Only the sizes whose utility differs from that of the largest size need probabilities.
+        maxSize = 0
+        for size in range(1, m+1):
+            if sizeUtilities[size] != sizeUtilities[m]:
+                maxSize = size
+
+        # Each candidate considers every set of size s that contains it, along with the 2^(s-1)
+        # subsets of each set that contain it.
+        numSets = 0
+        for size in range(1, maxSize+1):
+            numCombs = math.factorial(m-1)//(math.factorial(size-1)*math.factorial(m-size))
+            numSets += m*numCombs*2**(size-1)
+        if numSets > self.maxExactSets:
+            return None
+
+        pairProbs = self.getPairProbs(wmg)
+        utilities = dict()
+        for i in range(0, m):
+            sizeProbs = self.getTopSetSizeProbs(pairProbs, i, maxSize)
+            utilities[cands[i]] = sizeUtilities[m]
+            for size in range(1, maxSize+1):
+                utilities[cands[i]] += (sizeUtilities[size] - sizeUtilities[m])*sizeProbs[size]
+        return utilities
+
     def getInitialSample(self, wmg):
         """
         Generate an initial sample for the Markov chain. This function will return a 
@@ -362,6 +1256,40 @@ class MechanismMcmcCondorcet(MechanismMcmc):
                 V[pair[1]][pair[0]] = 1
         return V
 
+    def getSampleRow(self, sample):
+        """
+        Returns a flat list of integers that represents a binary relation in a binary sample
+        file, row by row.
+
+        :ivar list<list<int>> sample: A two-dimensional array that for every pair of candidates
+            cand1 and cand2, contains 1 if cand1 is ranked above cand2 and 0 otherwise.
+        """
+
+        return [value for row in sample for value in row]
+
+    def getSampleFromRow(self, row, numCands):
+        """
+        Returns the binary relation represented by a row of a binary sample file.
+
+        :ivar numpy.ndarray row: A row of a binary sample file.
+        :ivar int numCands: The number of candidates.
+        """
+
+        return row.reshape((numCands, numCands)).tolist()
+
+    def getRowsUtilities(self, rows, numCands, cands):
+        """
+        Returns a two-dimensional numpy array with the utility of each candidate, in the order of
+        cands, for the binary relation in each row of a binary sample file.
+
+        :ivar numpy.ndarray rows: A two-dimensional array of rows of a binary sample file.
+        :ivar int numCands: The number of candidates.
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        """
+
+        binaryRelations = rows.reshape((len(rows), numCands, numCands))
+        return self.utilityFunction.getUtilitiesBatchRelations(binaryRelations, cands)
+
     def getCandScoresMapBruteForce(self, profile):
         """
         Returns a dictonary that associates the integer representation of each candidate with the 
@@ -377,7 +1305,7 @@ class MechanismMcmcCondorcet(MechanismMcmc):
         gains = dict()
         for cand in wmg.keys():
             gains[cand] = 0
-        graphs = itertools.product(range(2), repeat=m*(m-1)/2)
+        graphs = itertools.product(range(2), repeat=m*(m-1)//2)
         for comb in graphs:
             prob = 1
             i = 0
@@ -389,10 +1317,36 @@ class MechanismMcmcCondorcet(MechanismMcmc):
                 else:
                     prob *= 1/(1+self.phi ** float(wmg[b+1][a+1]))
                 i += 1
-                if i >= m*(m-1)/2:
+                if i >= m*(m-1)//2:
                     break
             for cand in wmg.keys():
                 gains[cand] += self.utilityFunction.getUtility([cand], V)*prob
         return gains
 
+# The mechanism and the wmg are handed to each worker process once, when the process starts, and
+# each task carries the current sample and the random and numpy.random states of one chain.
+_mcmcWorkerArgs = None
+
+def _initMcmcWorker(mechanism, wmg):
+    global _mcmcWorkerArgs
+    _mcmcWorkerArgs = (mechanism, wmg)
+
+def _getMcmcChainBlock(task):
+    mechanism, wmg = _mcmcWorkerArgs
+    V, state, numpyState, numSamples, burnIn = task
+    random.setstate(state)
+    numpy.random.set_state(numpyState)
+    V, utilities = mechanism.getChainSamples(wmg, V, numSamples, burnIn)
+    return V, random.getstate(), numpy.random.get_state(), utilities
+
+# The costs and the mechanism are handed to each worker process once, when the process starts,
+# and each task is a chunk of prefixes.
+_mallowsBruteForceWorkerArgs = None
+
+def _initMallowsBruteForceWorker(mechanism, costs, cands, suffixLength):
+    global _mallowsBruteForceWorkerArgs
+    _mallowsBruteForceWorkerArgs = (mechanism, costs, cands, suffixLength)
 
+def _getMallowsBruteForceSums(prefixes):
+    mechanism, costs, cands, suffixLength = _mallowsBruteForceWorkerArgs
+    return mechanism.getBruteForceSums(costs, cands, prefixes, suffixLength)
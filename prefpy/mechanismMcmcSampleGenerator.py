@@ -1,7 +1,9 @@
 import numpy
 import copy
+import math
 import random
 import itertools
+import bisect
 
 class MechanismMcmcSampleGenerator():
 
@@ -9,6 +11,14 @@ class MechanismMcmcSampleGenerator():
         self.wmg = wmg
         self.phi = phi
 
+    def isExact(self):
+        """
+        Returns True if the generator draws independent samples from the target distribution
+        instead of advancing a Markov chain. By default, it does not.
+        """
+
+        return False
+
     def setWmg(self, wmg):
         """
         Function to set the wmg. Some child classes may do this in a specific way.
@@ -19,6 +29,25 @@ class MechanismMcmcSampleGenerator():
         """
 
         self.wmg = wmg
+        self.wmgMatrix = None
+
+    def getWmgMatrix(self):
+        """
+        Returns the wmg as a two-dimensional numpy array indexed by the integer representations of
+        the candidates, so that wmgMatrix[cand1][cand2] is wmg[cand1][cand2]. The array is built
+        the first time it is needed after the wmg is set, along with candArray, a numpy array of
+        the integer representations of the candidates.
+        """
+
+        if getattr(self, "wmgMatrix", None) is None:
+            cands = list(self.wmg.keys())
+            self.candArray = numpy.array(cands)
+            size = max(cands) + 1
+            self.wmgMatrix = numpy.zeros((size, size))
+            for cand1 in cands:
+                for cand2 in self.wmg[cand1].keys():
+                    self.wmgMatrix[cand1][cand2] = self.wmg[cand1][cand2]
+        return self.wmgMatrix
 
     def setPhi(self, phi):
         """
@@ -30,7 +59,97 @@ class MechanismMcmcSampleGenerator():
         self.phi = phi
 
 class MechanismMcmcSampleGeneratorMallows(MechanismMcmcSampleGenerator):
-    
+    """
+    The parent class for the Mallows sample generators. Child classes implement advance(), which
+    moves a sample held as a pair of numpy arrays one step along the Markov chain in place.
+    An order array contains integer representations of each candidate in order of their ranking,
+    from first to last, and a position array associates the integer representation of each
+    candidate with its index in the order array.
+    """
+
+    def getPositions(self, order):
+        """
+        Returns the position array of the given order array.
+
+        :ivar numpy.ndarray order: Contains integer representations of each candidate in order of
+            their ranking in a vote, from first to last.
+        """
+
+        position = numpy.zeros(max(order) + 1, dtype=int)
+        position[order] = numpy.arange(len(order))
+        return position
+
+    def getNextSample(self, V):
+        """
+        Generate the next sample from the current sample.
+
+        :ivar list<int> V: Contains integer representations of each candidate in order of their
+            ranking in a vote, from first to last. This is the current sample.
+        """
+
+        order = numpy.array(V)
+        self.advance(order, self.getPositions(order))
+        return order.tolist()
+
+    def advanceChains(self, orders, positions):
+        """
+        Moves several independent chains one step each, in place. Returns a boolean array that
+        is True for each chain whose proposal was accepted. By default, the chains are advanced
+        one at a time; child classes may advance them all at once.
+
+        :ivar numpy.ndarray orders: A two-dimensional array with the order array of each chain.
+        :ivar numpy.ndarray positions: A two-dimensional array with the position array of each
+            chain.
+        """
+
+        accepted = numpy.zeros(len(orders), dtype=bool)
+        for i in range(0, len(orders)):
+            accepted[i] = self.advance(orders[i], positions[i])
+        return accepted
+
+    def calcMovedExponent(self, moved, position, newPositions):
+        """
+        Returns the exponent of phi in the acceptance ratio for moving the given candidates to new
+        positions. Only pairs that contain a moved candidate can change their relative order, so
+        only those pairs are compared. Each pair of candidates, cand1 and cand2, that goes from
+        cand1 above cand2 to cand2 above cand1 adds wmg[cand1][cand2].
+
+        :ivar numpy.ndarray moved: The integer representations of the candidates that move.
+        :ivar numpy.ndarray position: The position array of the current sample.
+        :ivar numpy.ndarray newPositions: The new position of each candidate in moved.
+        """
+
+        wmgMatrix = self.getWmgMatrix()
+        newPosition = position.copy()
+        newPosition[moved] = newPositions
+        isMoved = numpy.zeros(len(position), dtype=bool)
+        isMoved[moved] = True
+        others = self.candArray
+
+        oldRows, newRows = position[moved][:, None], newPositions[:, None]
+        oldCols, newCols = position[others][None, :], newPosition[others][None, :]
+        flippedDown = (oldRows < oldCols) & (newRows > newCols)
+        flippedUp = (oldRows > oldCols) & (newRows < newCols) & ~isMoved[others][None, :]
+        exponent = wmgMatrix[moved][:, others][flippedDown].sum()
+        exponent += wmgMatrix[others][:, moved].T[flippedUp].sum()
+        return exponent
+
+    def calcOrderExponent(self, position, newPosition):
+        """
+        Returns the exponent of phi in the acceptance ratio for changing from the sample with the
+        first position array to the sample with the second, comparing every pair of candidates at
+        once.
+
+        :ivar numpy.ndarray position: The position array of the current sample.
+        :ivar numpy.ndarray newPosition: The position array of the proposed sample.
+        """
+
+        wmgMatrix = self.getWmgMatrix()
+        cands = self.candArray
+        old, new = position[cands], newPosition[cands]
+        flipped = (old[:, None] < old[None, :]) & (new[:, None] > new[None, :])
+        return wmgMatrix[cands][:, cands][flipped].sum()
+
     def calcAcceptanceRatio(self, V, W):
         """
         Given a order vector V and a proposed order vector W, calculate the acceptance ratio for 
@@ -63,30 +182,56 @@ class MechanismMcmcSampleGeneratorMallows(MechanismMcmcSampleGenerator):
 
 class MechanismMcmcSampleGeneratorMallowsAdjacentPairwiseFlip(MechanismMcmcSampleGeneratorMallows):
 
-    def getNextSample(self, V):
+    def advance(self, order, position):
         """
-        Generate the next sample by randomly flipping two adjacent candidates.
+        Moves the sample one step by randomly flipping two adjacent candidates, in place. Only the
+        flipped pair changes its relative order, so the acceptance ratio is phi^wmg[d][c], where d
+        was ranked directly above c. Returns True if the flip was accepted.
 
-        :ivar list<int> V: Contains integer representations of each candidate in order of their
-            ranking in a vote, from first to last. This is the current sample.
+        :ivar numpy.ndarray order: The order array of the current sample.
+        :ivar numpy.ndarray position: The position array of the current sample.
         """
 
         # Select a random alternative in V to switch with its adacent alternatives.
-        randPos = random.randint(0, len(V)-2)
-        W = copy.deepcopy(V)
-        d = V[randPos]
-        c = V[randPos+1]
-        W[randPos] = c
-        W[randPos+1] = d
+        randPos = random.randint(0, len(order)-2)
+        d = order[randPos]
+        c = order[randPos+1]
 
         # Check whether we should change to the new ranking.
-        prMW = 1
-        prMV = 1
-        prob = min(1.0,(prMW/prMV)*pow(self.phi, self.wmg[d][c]))/2
+        prob = min(1.0, pow(self.phi, self.getWmgMatrix()[d][c]))/2
         if random.random() <= prob:
-            V = W
-    
-        return V
+            order[randPos] = c
+            order[randPos+1] = d
+            position[c] = randPos
+            position[d] = randPos+1
+            return True
+        return False
+
+    def advanceChains(self, orders, positions):
+        """
+        Moves several independent chains one step each, in place, by flipping two adjacent
+        candidates in every chain at once. Returns a boolean array that is True for each chain
+        whose flip was accepted.
+
+        :ivar numpy.ndarray orders: A two-dimensional array with the order array of each chain.
+        :ivar numpy.ndarray positions: A two-dimensional array with the position array of each
+            chain.
+        """
+
+        numChains, numCands = orders.shape
+        chains = numpy.arange(numChains)
+        randPos = numpy.random.randint(0, numCands-1, size=numChains)
+        d = orders[chains, randPos]
+        c = orders[chains, randPos+1]
+
+        prob = numpy.minimum(1.0, self.phi**self.getWmgMatrix()[d, c])/2
+        accepted = numpy.random.random(numChains) <= prob
+        chains, randPos, d, c = chains[accepted], randPos[accepted], d[accepted], c[accepted]
+        orders[chains, randPos] = c
+        orders[chains, randPos+1] = d
+        positions[chains, c] = randPos
+        positions[chains, d] = randPos+1
+        return accepted
 
 class MechanismMcmcSampleGeneratorMallowsRandShuffle(MechanismMcmcSampleGeneratorMallows):
 
@@ -95,73 +240,246 @@ class MechanismMcmcSampleGeneratorMallowsRandShuffle(MechanismMcmcSampleGenerato
         self.phi = phi
         self.shuffleSize = shuffleSize
 
-    def getNextSample(self, V):
+    def advance(self, order, position):
         """
-        Generate the next sample by randomly shuffling candidates.
+        Moves the sample one step by randomly shuffling candidates, in place. Only pairs that
+        contain a shuffled candidate are compared for the acceptance ratio. Returns True if the
+        shuffle was accepted.
 
-        :ivar list<int> V: Contains integer representations of each candidate in order of their
-            ranking in a vote, from first to last. This is the current sample.
+        :ivar numpy.ndarray order: The order array of the current sample.
+        :ivar numpy.ndarray position: The position array of the current sample.
         """
 
-        positions = range(0, len(self.wmg))
+        positions = range(0, len(order))
         randPoss = random.sample(positions, self.shuffleSize)
-        flipSet = copy.deepcopy(randPoss)
+        flipSet = order[randPoss]
         randPoss.sort()
-        W = copy.deepcopy(V)
-        for j in range(0, self.shuffleSize):
-            W[randPoss[j]] = V[flipSet[j]]
+        newPositions = numpy.array(randPoss)
 
         # Check whether we should change to the new ranking.
-        prMW = 1.0
-        prMV = 1.0
-        acceptanceRatio = self.calcAcceptanceRatio(V, W)
-        prob = min(1.0,(prMW/prMV)*acceptanceRatio)
+        acceptanceRatio = self.phi**self.calcMovedExponent(flipSet, position, newPositions)
+        prob = min(1.0, acceptanceRatio)
         if random.random() <= prob:
-            V = W
-        return V
+            order[newPositions] = flipSet
+            position[flipSet] = newPositions
+            return True
+        return False
+
+    def advanceChains(self, orders, positions):
+        """
+        Moves several independent chains one step each, in place, by shuffling candidates in
+        every chain at once. Returns a boolean array that is True for each chain whose shuffle was
+        accepted.
+
+        :ivar numpy.ndarray orders: A two-dimensional array with the order array of each chain.
+        :ivar numpy.ndarray positions: A two-dimensional array with the position array of each
+            chain.
+        """
+
+        wmgMatrix = self.getWmgMatrix()
+        cands = self.candArray
+        numChains, numCands = orders.shape
+        chains = numpy.arange(numChains)[:, None]
+
+        # Each chain moves the candidates at shuffleSize random positions to those positions in
+        # sorted order.
+        randPoss = numpy.argsort(numpy.random.random((numChains, numCands)), axis=1)
+        randPoss = randPoss[:, :self.shuffleSize]
+        flipSet = orders[chains, randPoss]
+        newPositions = numpy.sort(randPoss, axis=1)
+        newPositionsAll = positions.copy()
+        newPositionsAll[chains, flipSet] = newPositions
+        isMoved = numpy.zeros(positions.shape, dtype=bool)
+        isMoved[chains, flipSet] = True
+
+        # Compare every moved candidate with every candidate, in every chain.
+        oldRows, newRows = positions[chains, flipSet][:, :, None], newPositions[:, :, None]
+        oldCols = positions[:, cands][:, None, :]
+        newCols = newPositionsAll[:, cands][:, None, :]
+        flippedDown = (oldRows < oldCols) & (newRows > newCols)
+        flippedUp = (oldRows > oldCols) & (newRows < newCols) & ~isMoved[:, cands][:, None, :]
+        movedRows, candCols = flipSet[:, :, None], cands[None, None, :]
+        exponents = (wmgMatrix[movedRows, candCols]*flippedDown).sum(axis=(1, 2))
+        exponents += (wmgMatrix[candCols, movedRows]*flippedUp).sum(axis=(1, 2))
+
+        prob = numpy.minimum(1.0, self.phi**exponents)
+        accepted = numpy.random.random(numChains) <= prob
+        orders[chains[accepted], newPositions[accepted]] = flipSet[accepted]
+        positions[accepted] = newPositionsAll[accepted]
+        return accepted
 
 class MechanismMcmcSampleGeneratorMallowsJumpingDistribution(MechanismMcmcSampleGeneratorMallows):
 
-    def getNextSample(self, V):
+    def getInsertionThresholds(self, numCands):
         """
-        We generate a new ranking based on a Mallows-based jumping distribution. The algorithm is 
-        described in "Bayesian Ordinal Peer Grading" by Raman and Joachims.
+        Returns a list that contains, for each j from 1 to numCands, the cumulative probabilities
+        of inserting the j-th candidate at each of the positions 1 to j. The thresholds are only
+        recalculated when phi or the number of candidates changes.
 
-        :ivar list<int> V: Contains integer representations of each candidate in order of their
-            ranking in a vote, from first to last.
+        :ivar int numCands: The number of candidates.
         """
 
-        phi = self.phi
-        wmg = self.wmg
-        W = []
-        W.append(V[0])
-        for j in range(2, len(V)+1):
-            randomSelect = random.random()
-            threshold = 0.0
-            denom = 1.0
-            for k in range(1, j):
-                denom = denom + phi**k
-            for k in range(1, j+1):
-                numerator = phi**(j - k)
-                threshold = threshold + numerator/denom
-                if randomSelect <= threshold:
-                    W.insert(k-1,V[j-1])
-                    break    
+        if getattr(self, "insertionThresholds", None) is None or \
+           len(self.insertionThresholds) != numCands or self.insertionPhi != self.phi:
+            phi = self.phi
+            self.insertionPhi = phi
+            self.insertionThresholds = [[1.0]]
+            for j in range(2, numCands+1):
+                threshold = 0.0
+                denom = 1.0
+                for k in range(1, j):
+                    denom = denom + phi**k
+                thresholds = []
+                for k in range(1, j+1):
+                    threshold = threshold + phi**(j - k)/denom
+                    thresholds.append(threshold)
+                self.insertionThresholds.append(thresholds)
+        return self.insertionThresholds
+
+    def advance(self, order, position):
+        """
+        We generate a new ranking based on a Mallows-based jumping distribution, and move to it
+        in place if it is accepted. The algorithm is described in "Bayesian Ordinal Peer Grading"
+        by Raman and Joachims. Returns True if the new ranking was accepted.
+
+        :ivar numpy.ndarray order: The order array of the current sample.
+        :ivar numpy.ndarray position: The position array of the current sample.
+        """
+
+        insertionThresholds = self.getInsertionThresholds(len(order))
+        W = [order[0]]
+        for j in range(2, len(order)+1):
+            thresholds = insertionThresholds[j-1]
+            k = min(bisect.bisect_left(thresholds, random.random()), j-1)
+            W.insert(k, order[j-1])
 
         # Check whether we should change to the new ranking.
-        acceptanceRatio = self.calcAcceptanceRatio(V, W)
-        prob = min(1.0,acceptanceRatio)
+        W = numpy.array(W)
+        newPosition = self.getPositions(W)
+        acceptanceRatio = self.phi**self.calcOrderExponent(position, newPosition)
+        prob = min(1.0, acceptanceRatio)
         if random.random() <= prob:
-            V = W
+            order[:] = W
+            position[:] = newPosition
+            return True
+        return False
+
+class MechanismMcmcSampleGeneratorMallowsRepeatedInsertion(MechanismMcmcSampleGeneratorMallowsJumpingDistribution):
+    """
+    When every edge of the wmg has the same weight w and the edges are transitive, the Mallows
+    distribution over the wmg is a Mallows model with phi^w centered on the ranking the wmg
+    agrees with, and this generator draws independent samples from it with the repeated
+    insertion model. Otherwise, it advances a Markov chain with the jumping distribution.
+    """
+
+    def getCentralRanking(self):
+        """
+        Returns a numpy array with the ranking the wmg agrees with on every pair and the weight
+        of every edge, or None if the wmg is not of that form. The result is recalculated only
+        when the wmg changes.
+        """
+
+        if getattr(self, "centralRankingWmg", None) is not self.wmg:
+            self.centralRankingWmg = self.wmg
+            self.centralRanking = None
+            wmgMatrix = self.getWmgMatrix()
+            cands = self.candArray
+            edges = wmgMatrix[cands][:, cands]
+            offDiagonal = ~numpy.eye(len(cands), dtype=bool)
+            weight = numpy.abs(edges[offDiagonal]).max() if len(cands) > 1 else 1.0
+            if weight > 0 and numpy.allclose(numpy.abs(edges[offDiagonal]), weight):
+
+                # In a transitive tournament, ordering by the number of wins agrees with every edge.
+                order = numpy.argsort(-(edges > 0).sum(axis=1), kind="mergesort")
+                edges = edges[order][:, order]
+                if numpy.all(edges[numpy.triu_indices(len(cands), 1)] > 0):
+                    self.centralRanking = (cands[order], weight)
+        return self.centralRanking
+
+    def isExact(self):
+        """
+        Returns True if the wmg is a central ranking, so that samples are drawn independently.
+        """
+
+        return self.getCentralRanking() != None
 
-        return V
+    def getSamples(self, numSamples):
+        """
+        Returns a two-dimensional numpy array with numSamples independent samples as order
+        arrays. Each sample inserts the candidates of the central ranking one at a time, and the
+        j-th candidate is inserted i positions above the bottom with probability proportional to
+        (phi^w)^i. This function assumes that the wmg is a central ranking.
+
+        :ivar int numSamples: The number of samples to be drawn.
+        """
+
+        center, weight = self.getCentralRanking()
+        dispersion = self.phi**weight
+        numCands = len(center)
+        positions = numpy.zeros((numSamples, numCands), dtype=int)
+        for j in range(1, numCands):
+
+            # Draw where the candidate is inserted among the j candidates already inserted and
+            # move the candidates at or below that position down by one.
+            weights = dispersion**numpy.arange(j, -1, -1, dtype=float)
+            thresholds = numpy.cumsum(weights)/weights.sum()
+            inserted = numpy.searchsorted(thresholds, numpy.random.random(numSamples))
+            inserted = numpy.minimum(inserted, j)
+            positions[:, :j] += positions[:, :j] >= inserted[:, None]
+            positions[:, j] = inserted
+
+        orders = numpy.zeros((numSamples, numCands), dtype=center.dtype)
+        orders[numpy.arange(numSamples)[:, None], positions] = center
+        return orders
+
+    def advance(self, order, position):
+        """
+        Replaces the sample with an independent one, in place, if the wmg is a central ranking,
+        and otherwise moves it one step with the jumping distribution. Returns True if the sample
+        changed.
+
+        :ivar numpy.ndarray order: The order array of the current sample.
+        :ivar numpy.ndarray position: The position array of the current sample.
+        """
+
+        if not self.isExact():
+            return MechanismMcmcSampleGeneratorMallowsJumpingDistribution.advance(self, order,
+                                                                                  position)
+        order[:] = self.getSamples(1)[0]
+        position[order] = numpy.arange(len(order))
+        return True
+
+    def advanceChains(self, orders, positions):
+        """
+        Replaces the samples of several chains with independent ones, in place, if the wmg is a
+        central ranking, and otherwise moves each chain one step with the jumping distribution.
+        Returns a boolean array that is True for each chain whose sample changed.
+
+        :ivar numpy.ndarray orders: A two-dimensional array with the order array of each chain.
+        :ivar numpy.ndarray positions: A two-dimensional array with the position array of each
+            chain.
+        """
+
+        if not self.isExact():
+            return MechanismMcmcSampleGeneratorMallowsJumpingDistribution.advanceChains(self,
+                orders, positions)
+        orders[:] = self.getSamples(len(orders))
+        chains = numpy.arange(len(orders))[:, None]
+        positions[chains, orders] = numpy.arange(orders.shape[1])
+        return numpy.ones(len(orders), dtype=bool)
 
 class MechanismMcmcSampleGeneratorMallowsPlakettLuce(MechanismMcmcSampleGeneratorMallows):
+    """
+    Proposes a new ranking by drawing the candidates of the current ranking with Plakett-Luce
+    weights, where the candidate at position i has weight phi^i. A whole ranking is drawn at once
+    by sorting the logarithms of the weights perturbed by Gumbel noise, and the probabilities of
+    drawing one ranking from another are computed from cumulative sums of the weights.
+    """
 
     def __init__(self, wmg, phi):
         self.wmg = wmg
         self.phi = phi
-        self.plakettLuceProbs = self.calcDrawingProbs()
+        self.calcLogWeights()
 
     def setWmg(self, wmg):
         """
@@ -174,8 +492,9 @@ class MechanismMcmcSampleGeneratorMallowsPlakettLuce(MechanismMcmcSampleGenerato
             dictionary represents a weighted majority graph for an election.
         """
 
-        self.plakettLuceProbs = calcDrawingProbs()
         self.wmg = wmg
+        self.wmgMatrix = None
+        self.calcLogWeights()
 
     def setPhi(self, phi):
         """
@@ -185,8 +504,54 @@ class MechanismMcmcSampleGeneratorMallowsPlakettLuce(MechanismMcmcSampleGenerato
         :ivar float phi: A value for phi such that 0 <= phi <= 1.        
         """
 
-        self.plakettLuceProbs = calcDrawingProbs()
         self.phi = phi
+        self.calcLogWeights()
+
+    def calcLogWeights(self):
+        """
+        Calculates logWeights, a numpy array with the logarithm of the weight phi^i of the
+        candidate at each position i, and plakettLuceProbs, the normalized weights.
+        """
+
+        with numpy.errstate(divide="ignore"):
+            self.logWeights = numpy.arange(len(self.wmg))*numpy.log(float(self.phi))
+        self.plakettLuceProbs = self.calcDrawingProbs()
+
+    def calcDrawingProbs(self):
+        """
+        Returns a vector that contains the probabily of an item being from each position. We say
+        that every item in a order vector is drawn with weight phi^i where i is its position.
+        """
+
+        weights = numpy.exp(self.logWeights - self.logWeights.max())
+        return (weights/weights.sum()).tolist()
+
+    def calcLogDrawingProb(self, drawnPositions):
+        """
+        Returns the logarithm of the probability of drawing the candidates at the given positions
+        of a ranking in the given order. The candidate drawn at step t is chosen among the
+        candidates drawn from step t on, so each step divides its weight by a sum over a suffix
+        of the draw, and all of these sums are computed with one cumulative sum.
+
+        :ivar numpy.ndarray drawnPositions: The position, in the ranking drawn from, of each
+            candidate in the order in which they are drawn.
+        """
+
+        logWeights = self.logWeights[drawnPositions]
+        logSuffixSums = numpy.logaddexp.accumulate(logWeights[::-1])[::-1]
+        return (logWeights - logSuffixSums).sum()
+
+    def drawPositionsPlakettLuce(self, numCands):
+        """
+        Returns a numpy array with the positions of the candidates of a ranking in the order in
+        which they are drawn. Sorting the logarithms of the weights perturbed by independent
+        Gumbel noise draws the whole order from the Plakett-Luce distribution at once.
+
+        :ivar int numCands: The number of candidates in the ranking.
+        """
+
+        keys = self.logWeights[:numCands] + numpy.random.gumbel(size=numCands)
+        return numpy.argsort(-keys, kind="mergesort")
 
     def getNextSample(self, V):
         """
@@ -197,70 +562,46 @@ class MechanismMcmcSampleGeneratorMallowsPlakettLuce(MechanismMcmcSampleGenerato
             ranking in a vote, from first to last.
         """
 
-        W, WProb = self.drawRankingPlakettLuce(V)
-        VProb = self.calcProbOfVFromW(V, W)
-        acceptanceRatio = self.calcAcceptanceRatio(V, W)
-        prob = min(1.0, acceptanceRatio * (VProb/WProb))
-        if random.random() <= prob:
-            V = W
-        return V
+        order = numpy.array(V)
+        self.advance(order, self.getPositions(order))
+        return order.tolist()
 
-    def calcDrawingProbs(self):
-        """
-        Returns a vector that contains the probabily of an item being from each position. We say
-        that every item in a order vector is drawn with weight phi^i where i is its position.
+    def advance(self, order, position):
         """
+        Moves the sample one step, in place, by drawing a new ranking with Plakett-Luce weights.
+        Returns True if the new ranking was accepted.
 
-        wmg = self.wmg
-        phi = self.phi
-
-        # We say the weight of the candidate in position i is phi^i.
-        weights = []
-        for i in range(0, len(wmg.keys())):
-            weights.append(phi**i)
+        :ivar numpy.ndarray order: The order array of the current sample.
+        :ivar numpy.ndarray position: The position array of the current sample.
+        """
 
-        # Calculate the probabilty that an item at each weight is drawn.
-        totalWeight = sum(weights)
-        for i in range(0, len(wmg.keys())):
-            weights[i] = weights[i]/totalWeight
+        drawnPositions = self.drawPositionsPlakettLuce(len(order))
+        W = order[drawnPositions]
+        newPosition = self.getPositions(W)
 
-        return weights
+        # The reverse draw takes the candidates of W in the order of the current ranking.
+        logWProb = self.calcLogDrawingProb(drawnPositions)
+        logVProb = self.calcLogDrawingProb(newPosition[order])
+        acceptanceRatio = self.phi**self.calcOrderExponent(position, newPosition)
+        prob = min(1.0, acceptanceRatio * math.exp(logVProb - logWProb))
+        if random.random() <= prob:
+            order[:] = W
+            position[:] = newPosition
+            return True
+        return False
 
     def drawRankingPlakettLuce(self, rankList):
         """
         Given an order vector over the candidates, draw candidates to generate a new order vector.
+        Returns the new order vector and the probability of drawing it.
 
         :ivar list<int> rankList: Contains integer representations of each candidate in order of their
             rank in a vote, from first to last.
         """
 
-        probs = self.plakettLuceProbs
-        numCands = len(rankList)
-        newRanking = []
-        remainingCands = copy.deepcopy(rankList)
-        probsCopy = copy.deepcopy(self.plakettLuceProbs)
-        totalProb = sum(probs)
-
-        # We will use prob to iteratively calculate the probabilty that we draw the order vector
-        # that we end up drawing.
-        prob = 1.0
-        
-        while (len(newRanking) < numCands):
-
-            # We generate a random number from 0 to 1, and use it to select a candidate. 
-            rand = random.random()
-            threshold = 0.0
-            for i in range(0, len(probsCopy)):
-                threshold = threshold + probsCopy[i]/totalProb
-                if rand <= threshold:
-                    prob = prob * probsCopy[i]/totalProb
-                    newRanking.append(remainingCands[i])
-                    remainingCands.pop(i)
-                    totalProb = totalProb - probsCopy[i]
-                    probsCopy.pop(i)
-                    break
-
-        return newRanking, prob
+        drawnPositions = self.drawPositionsPlakettLuce(len(rankList))
+        newRanking = [rankList[i] for i in drawnPositions]
+        return newRanking, math.exp(self.calcLogDrawingProb(drawnPositions))
 
     def calcProbOfVFromW(self, V, W):
         """
@@ -273,58 +614,97 @@ class MechanismMcmcSampleGeneratorMallowsPlakettLuce(MechanismMcmcSampleGenerato
             ranking in a vote, from first to last.
         """
 
-        weights = range(0, len(V))
-        i = 0
-        for alt in W:
-            weights[alt-1] = self.phi ** i
-            i = i + 1
-        
-        # Calculate the probability that we draw V[0], V[1], and so on from W.
-        prob = 1.0
-        totalWeight = sum(weights)
-        for alt in V:
-            prob = prob * weights[alt-1]/totalWeight
-            totalWeight = totalWeight - weights[alt-1]
-    
-        return prob
+        positionInW = self.getPositions(numpy.array(W))
+        return math.exp(self.calcLogDrawingProb(positionInW[numpy.array(V)]))
 
 class MechanismMcmcSampleGeneratorCondorcet(MechanismMcmcSampleGenerator):
+    """
+    The sample generator for the Condorcet model, in which each pair of candidates is ordered
+    independently. The probability that each candidate is ranked above each other candidate is
+    computed whenever the wmg or phi is set.
+    """
 
-    def getNextSample(self, V):
+    def __init__(self, wmg, phi):
+        self.wmg = wmg
+        self.phi = phi
+        self.calcPairProbs()
+
+    def setWmg(self, wmg):
         """
-        Generate the next sample for the condorcet model. This algorithm is described in "Computing
-        Optimal Bayesian Decisions for Rank Aggregation via MCMC Sampling," and is adapted from 
-        code written by Lirong Xia.
-        
-        :ivar list<list<int> V: A two-dimensional list that for every pair of candidates cand1 and 
-            cand2, V[cand1][cand2] contains 1 if cand1 is ranked above cand2 more times than cand2
-            is ranked above cand1 and 0 otherwise.
+        Function to set the wmg. When we change the wmg, we must also recalculate the pair
+        probabilities.
+
+        ivar: dict<int,<dict,<int,int>>> wmg: A two-dimensional dictionary that associates integer
+            representations of each pair of candidates, cand1 and cand2, with the number of times
+            cand1 is ranked above cand2 minus the number of times cand2 is ranked above cand1. The
+            dictionary represents a weighted majority graph for an election.
         """
 
-        cands = range(len(self.wmg))
-        W = copy.deepcopy(V)
-        allPairs = itertools.combinations(cands, 2)
-        for pair in allPairs:
-            a = pair[0]
-            b = pair[1]
-            if random.random() < 1.0/(1.0+pow(self.phi,self.wmg[a+1][b+1])):
-                W[a][b] = 1
-                W[b][a] = 0
-            else:
-                W[a][b] = 0
-                W[b][a] = 1
-        prMW = 1
-        prMV = 1
-        prob = min(1.0, prMW/prMV)
-        if random.random() <= prob:
-            V = W
-        return V
+        self.wmg = wmg
+        self.wmgMatrix = None
+        self.calcPairProbs()
 
+    def setPhi(self, phi):
+        """
+        Function to set phi. When we change phi, we must also recalculate the pair probabilities.
 
+        :ivar float phi: A value for phi such that 0 <= phi <= 1.        
+        """
 
+        self.phi = phi
+        self.calcPairProbs()
 
+    def calcPairProbs(self):
+        """
+        Calculates pairProbs, a two-dimensional numpy array such that for every pair of
+        candidates cand1 and cand2, pairProbs[cand1-1][cand2-1] is the probability that cand1 is
+        ranked above cand2, along with the indices of the pairs above the diagonal.
+        """
 
+        numCands = len(self.wmg)
+        wmgMatrix = numpy.zeros((numCands, numCands))
+        for a in range(0, numCands):
+            for b in range(0, numCands):
+                if a != b:
+                    wmgMatrix[a][b] = self.wmg[a+1][b+1]
+        with numpy.errstate(divide="ignore", over="ignore"):
+            self.pairProbs = 1.0/(1.0 + numpy.power(float(self.phi), wmgMatrix))
+        self.upperPairs = numpy.triu_indices(numCands, 1)
+
+    def isExact(self):
+        """
+        Returns True, since every sample is drawn independently of the current one.
+        """
 
+        return True
+
+    def getSamples(self, numSamples):
+        """
+        Returns a three-dimensional boolean numpy array with numSamples independent samples, such
+        that samples[s][cand1-1][cand2-1] is True if cand1 is ranked above cand2 in sample s.
+        Every pair of every sample is decided by a single draw of uniform numbers.
+
+        :ivar int numSamples: The number of samples to be drawn.
+        """
 
+        numCands = len(self.pairProbs)
+        rows, cols = self.upperPairs
+        above = numpy.random.random((numSamples, len(rows))) < self.pairProbs[rows, cols]
+        samples = numpy.zeros((numSamples, numCands, numCands), dtype=bool)
+        samples[:, rows, cols] = above
+        samples[:, cols, rows] = ~above
+        return samples
 
+    def getNextSample(self, V):
+        """
+        Generate the next sample for the condorcet model. This algorithm is described in "Computing
+        Optimal Bayesian Decisions for Rank Aggregation via MCMC Sampling," and is adapted from 
+        code written by Lirong Xia. Every proposal is accepted, so the next sample is drawn
+        independently of V.
+        
+        :ivar list<list<int> V: A two-dimensional list that for every pair of candidates cand1 and 
+            cand2, V[cand1][cand2] contains 1 if cand1 is ranked above cand2 more times than cand2
+            is ranked above cand1 and 0 otherwise.
+        """
 
+        return self.getSamples(1)[0].astype(int).tolist()
@@ -1,15 +1,292 @@
+import csv
+import json
+import multiprocessing
 import random
+import time
+import numpy as np
 from .mechanism import Mechanism
 from .preference import Preference
 from .profile import Profile
 
+class STVBallots():
+    """
+    An array-backed representation of the ballots of an STV count. Ballots are held as a matrix of
+    candidate indices with one row per ranking, and each ranking keeps an offset to the candidate
+    it currently supports. Each candidate keeps a pile of the rows that currently support her, so
+    that eliminating a candidate transfers her whole pile at once.
+
+    :ivar list<int> cands: Contains integer representations of each candidate. The position of a
+        candidate in this list is the index used for her in all of the arrays below.
+    :ivar numpy.ndarray ballots: A matrix with one row for each ranking that contains candidate
+        indices from most to least preferred. Each row is padded with len(cands), the index of the
+        exhausted pile, which is always the last column.
+    :ivar numpy.ndarray counts: The number of votes that hold each ranking. When the ballots are
+        weighted, these are floats that are scaled down as surpluses are transferred.
+    :ivar numpy.ndarray offsets: The column of the candidate each ranking currently supports.
+    :ivar list<numpy.ndarray> piles: For each candidate index and for the exhausted pile, the
+        rows of the rankings that currently support that candidate.
+    :ivar numpy.ndarray scores: For each candidate index and for the exhausted pile, the number of
+        votes that currently support that candidate.
+    """
+
+    def __init__(self, profile, weighted = False):
+        self.cands = sorted(profile.candMap.keys())
+        numCands = len(self.cands)
+        candIndices = dict()
+        for i in range(0, numCands):
+            candIndices[self.cands[i]] = i
+
+        # We ignore ties within a ranking and use the first candidate of each tier.
+        orderVectors = profile.getOrderVectors()
+        self.ballots = np.full((len(orderVectors), numCands + 1), numCands, dtype=np.intp)
+        for i in range(0, len(orderVectors)):
+            ranking = [candIndices[tier[0]] for tier in orderVectors[i]]
+            self.ballots[i, :len(ranking)] = ranking
+        self.counts = np.array(profile.getPreferenceCounts(), dtype=float if weighted else None)
+        self.offsets = np.zeros(len(orderVectors), dtype=np.intp)
+
+        self.piles = [np.zeros(0, dtype=np.intp) for i in range(0, numCands + 1)]
+        self.scores = np.zeros(numCands + 1, dtype=self.counts.dtype)
+        self.addToPiles(np.arange(len(orderVectors)))
+
+    def getPositionCounts(self):
+        """
+        Returns a matrix that associates each candidate index and each position with the number of
+        votes that rank the candidate at that position, starting from 0. The matrix is computed
+        from the original rankings the first time it is needed and reused afterwards.
+        """
+
+        if getattr(self, "positionCounts", None) is None:
+            numCands = len(self.cands)
+            positions = np.tile(np.arange(self.ballots.shape[1]), len(self.ballots))
+            cands = self.ballots.ravel()
+            weights = np.repeat(self.counts, self.ballots.shape[1])
+            isRanked = cands < numCands
+            self.positionCounts = np.bincount(cands[isRanked]*numCands + positions[isRanked],
+                                              weights=weights[isRanked],
+                                              minlength=numCands*numCands)
+            self.positionCounts = self.positionCounts.reshape((numCands, numCands))
+        return self.positionCounts
+
+    def addToPiles(self, rows):
+        """
+        Adds the given rows to the piles of the candidates they currently support and adds their
+        counts to the scores of those candidates. Returns an array with the change in score of
+        each candidate index and of the exhausted pile.
+
+        :ivar numpy.ndarray rows: The rows of the rankings to be added to piles.
+        """
+
+        deltaScores = np.zeros(len(self.scores), dtype=self.scores.dtype)
+        if len(rows) == 0:
+            return deltaScores
+
+        # Group the rows by the candidate they support with a single sort.
+        tops = self.ballots[rows, self.offsets[rows]]
+        order = np.argsort(tops, kind="mergesort")
+        rows = rows[order]
+        tops = tops[order]
+        receivers, starts = np.unique(tops, return_index=True)
+        deltaScores[receivers] = np.add.reduceat(self.counts[rows], starts)
+        ends = np.append(starts[1:], len(rows))
+        for cand, start, end in zip(receivers, starts, ends):
+            self.piles[cand] = np.concatenate((self.piles[cand], rows[start:end]))
+        self.scores += deltaScores
+        return deltaScores
+
+    def transferPile(self, cand, continuing):
+        """
+        Moves every ranking in the pile of the given candidate to its next continuing candidate,
+        or to the exhausted pile if there is none. Returns an array with the change in score of
+        each candidate index and of the exhausted pile.
+
+        :ivar int cand: The index of the candidate whose pile is transferred.
+        :ivar numpy.ndarray continuing: A boolean array with an entry for each candidate index and
+            for the exhausted pile that is True if the candidate can still recieve votes. The
+            entry for the exhausted pile must be True.
+        """
+
+        rows = self.piles[cand]
+        self.piles[cand] = np.zeros(0, dtype=np.intp)
+        deltaScores = np.zeros(len(self.scores), dtype=self.scores.dtype)
+        deltaScores[cand] -= self.scores[cand]
+        self.scores[cand] = 0
+
+        # Advance every ranking that points at a non-continuing candidate, one column at a time.
+        moving = rows
+        while len(moving) > 0:
+            moving = moving[~continuing[self.ballots[moving, self.offsets[moving]]]]
+            self.offsets[moving] += 1
+
+        deltaScores += self.addToPiles(rows)
+        return deltaScores
+
+class STVRoundHistory():
+    """
+    The scores of every candidate at the start of every round of an STV count, stored as a matrix
+    with one row per round and one column per candidate. Rows are added as the count proceeds, so
+    tie-breaking that looks at earlier rounds only compares stored columns instead of replaying
+    the count.
+
+    :ivar list<int> cands: Contains integer representations of each candidate, in the order of
+        the columns of the score matrix.
+    :ivar int numRounds: The number of rounds stored so far.
+    """
+
+    def __init__(self, cands, dtype = int):
+        self.cands = cands
+        self.candIndices = dict()
+        for i in range(0, len(cands)):
+            self.candIndices[cands[i]] = i
+        self.numRounds = 0
+        self.roundScores = np.zeros((len(cands) + 1, len(cands)), dtype=dtype)
+
+    def addRound(self, scores):
+        """
+        Stores the scores of the candidates at the start of a new round.
+
+        :ivar numpy.ndarray scores: The score of each candidate, in the order of cands.
+        """
+
+        if self.numRounds == len(self.roundScores):
+            self.roundScores = np.concatenate((self.roundScores, np.zeros_like(self.roundScores)))
+        self.roundScores[self.numRounds] = scores[:len(self.cands)]
+        self.numRounds += 1
+
+    def getRoundScores(self):
+        """
+        Returns a matrix with one row for each stored round that contains the score of each
+        candidate, in the order of cands, at the start of that round.
+        """
+
+        return self.roundScores[:self.numRounds]
+
+    def getLowestCands(self, cands, forward = True):
+        """
+        Returns the set of candidates from cands whose scores are lexicographically lowest when the
+        rounds are compared from the first round on (forward) or from the latest round back
+        (backward).
+
+        :ivar set<int> cands: A set of candidates to compare.
+        :ivar bool forward: True to compare from the first round on, and False to compare from the
+            latest round back.
+        """
+
+        cands = list(cands)
+        columns = self.getRoundScores()[:, [self.candIndices[cand] for cand in cands]]
+
+        # numpy.lexsort uses its last key as the primary key.
+        if forward:
+            columns = columns[::-1]
+        lowest = np.lexsort(columns)[0]
+        isLowest = np.all(columns == columns[:, lowest:lowest+1], axis=0)
+        return set(cands[i] for i in np.flatnonzero(isLowest))
+
+class STVTrace():
+    """
+    A round-by-round log of an STV count. A trace is attached to a mechanism by setting its trace
+    attribute, and every count of that mechanism then records one entry per round. Counts with
+    no trace attached skip all of the bookkeeping below.
+
+    :ivar list<int> cands: Contains integer representations of each candidate in the last count.
+    :ivar list<dict> rounds: For each round of the last count, a dictionary with the seconds the
+        round took, the candidates elected and eliminated in it, the transfers it made as
+        [from, to, votes] lists (to is None for exhausted votes), the exhausted votes and the
+        score and pile size of each candidate at the end of the round.
+    """
+
+    def __init__(self):
+        self.cands = []
+        self.rounds = []
+
+    def startCount(self, cands):
+        """
+        Clears the trace at the start of a new count.
+
+        :ivar list<int> cands: Contains integer representations of each candidate, in the order
+            of the score arrays of the count.
+        """
+
+        self.cands = list(cands)
+        self.rounds = []
+
+    def addRound(self, seconds, elected, eliminated, transfers, scores, piles = None):
+        """
+        Records one round of the count.
+
+        :ivar float seconds: The time the round took.
+        :ivar list<int> elected: The candidates elected in this round.
+        :ivar list<int> eliminated: The candidates eliminated in this round.
+        :ivar list<tuple<int,numpy.ndarray>> transfers: For each pile transferred in this round,
+            the index of the candidate it came from and the change in score of each candidate
+            index and of the exhausted pile, as returned by STVBallots.transferPile().
+        :ivar numpy.ndarray scores: The score of each candidate index and of the exhausted pile at
+            the end of the round.
+        :ivar list<numpy.ndarray> piles: The piles of each candidate index at the end of the round,
+            or None if the count does not keep piles.
+        """
+
+        numCands = len(self.cands)
+        roundTransfers = []
+        for fromCand, deltaScores in transfers:
+            for i in np.flatnonzero(deltaScores > 0):
+                toCand = self.cands[i] if i < numCands else None
+                roundTransfers.append([self.cands[fromCand], toCand, deltaScores[i].item()])
+
+        roundData = dict()
+        roundData["round"] = len(self.rounds) + 1
+        roundData["seconds"] = seconds
+        roundData["elected"] = [int(cand) for cand in elected]
+        roundData["eliminated"] = [int(cand) for cand in eliminated]
+        roundData["transfers"] = roundTransfers
+        roundData["exhausted"] = scores[numCands].item()
+        roundData["scores"] = [scores[i].item() for i in range(0, numCands)]
+        if piles is not None:
+            roundData["pileSizes"] = [len(piles[i]) for i in range(0, numCands)]
+        self.rounds.append(roundData)
+
+    def exportJsonFile(self, fileName):
+        """
+        Exports a json file that contains the candidates and every round of the last count.
+
+        :ivar str fileName: The name of the output file to be exported.
+        """
+
+        outfile = open(fileName, 'w')
+        json.dump({"cands": self.cands, "rounds": self.rounds}, outfile)
+        outfile.close()
+
+    def exportCsvFile(self, fileName):
+        """
+        Exports a csv file with one row per round of the last count, holding the time the round
+        took, the candidates elected and eliminated in it, the exhausted votes and the score of
+        each candidate at the end of the round. Transfers are only exported to json.
+
+        :ivar str fileName: The name of the output file to be exported.
+        """
+
+        outfile = open(fileName, 'w')
+        writer = csv.writer(outfile)
+        writer.writerow(["round", "seconds", "elected", "eliminated", "exhausted"] + self.cands)
+        for roundData in self.rounds:
+            writer.writerow([roundData["round"], roundData["seconds"],
+                             " ".join(str(cand) for cand in roundData["elected"]),
+                             " ".join(str(cand) for cand in roundData["eliminated"]),
+                             roundData["exhausted"]] + roundData["scores"])
+        outfile.close()
+
 class MechanismSTV(Mechanism):
     """
     The Single Transferable Vote Mechanism. This class is the parent class for
     several mechanisms and cannot be constructed directly. All child classes are
-    expected to implement getScoringVector() method.
+    expected to implement breakLoserTie() method.
+
+    :ivar STVTrace trace: A trace that records every round of each count, or
+        None to count without recording.
     """
 
+    trace = None
+
     def __init__(self):
         self.maximizeCandScore = True
         self.seatsAvailable = 1
@@ -24,69 +301,32 @@ class MechanismSTV(Mechanism):
 
         return (profile.numVoters / (self.seatsAvailable + 1)) + 1
 
-    def convRankingToTuple(self, ranking):
+    def getPositionalScores(self, ballots, scoringVector):
         """
-        Returns a tuple of tuples that represents the ranking where the first inner
-        tuple contains candidates that are ranked number 1 in original ranking and
-        so on for each following inner tuple. e.g. {{4,}, {1,}, {3,}, {2,}} is a
-        ranking where candidates are ranked in the order 4 > 1 > 3 > 2.
-
-        :rtype tuple<tuple<int>>: will referred to as tupleRanking type.
+        Returns a dictionary that associates integer representations of each candidate with the
+        score they recieve from scoringVector over the original rankings. The scores are computed
+        from the position count matrix of the ballots, which is built only once per count.
 
-        :ivar dict<int,list<int>> ranking: A mapping of ranking position number to
-            list of candidates ranked at that position. e.g. {1:[2,3]} means
-            candidates 2 and 3 are both ranked number 1 in the ranking.
+        :ivar STVBallots ballots: The ballots of the election.
+        :ivar list<int> scoringVector: A list of integers (or floats) that give the scores assigned
+            to each position in a ranking from first to last.
         """
 
-        return tuple(tuple(ranking[k+1]) for k in range(0,len(ranking)))
+        scores = ballots.getPositionCounts().dot(np.asarray(scoringVector, dtype=float))
+        return dict((ballots.cands[i], scores[i]) for i in range(0, len(ballots.cands)))
 
-    def getInitialCandMaps(self, profile):
+    def prepareTieBreak(self, profile, ballots):
         """
-        Returns a multi-part representation of the election profile referenced by
-        profile.
-
-        .. note:: tupleRanking is equal to tuple<tuple<int>> as returned by
-            convRankingToTuple.
-        :rtype dict<int,int> candScoreMap: A mapping of each candidate to their
-            score, which starts out as the number of rankings with this candidate
-            ranked first, or 0 if no rankings start out supporting this canddiate.
-        :rtype dict<int,list<tupleRanking>> candPreferenceMap: A mapping of each
-            candidate to a list all rankings, represented as tuple of tuples, that
-            contribute to their score, which starts out empty.
-        :rtype dict<tupleRanking, int> rankingCount: A mapping of rankings in tuple
-            form to their corresponding count as given by profile.
-        :rtype dict<tupleRanking, int> rankingOffset: A mapping of rankings in tuple
-            form to the their own offset, which shows which candidate the ranking is
-            currently supporting. Each ranking starts off supporting its first ranked
-            candidate.
+        Called once at the start of every count, before any tie is broken, so that child classes
+        can compute the data their tie breaking needs. By default, nothing is computed.
 
         :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar STVBallots ballots: The ballots of the election.
         """
 
-        allCands = list(profile.candMap.keys())
-        rankMaps = profile.getReverseRankMaps()
-        rankMapCounts = profile.getPreferenceCounts()
-
-        # initialize all cands to have 0 score and [] supporting rankings
-        candScoreMap, candPreferenceMap = {},{}
-        for cand in allCands:
-            candScoreMap[cand] = 0
-            candPreferenceMap[cand] = []
-        rankingOffset = {}
-        rankingCount = {}
-
-        for ranking,count in zip(rankMaps,rankMapCounts):
-            tupleRanking = self.convRankingToTuple(ranking)
-            rankingCount[tupleRanking] = count
-            # find top ranked candidate and add to his score and supporint rankings
-            candScoreMap[tupleRanking[0][0]] += rankingCount[tupleRanking]
-            candPreferenceMap[tupleRanking[0][0]].append(tupleRanking)
-            if tupleRanking not in rankingOffset:
-                rankingOffset[tupleRanking] = 0
+        pass
 
-        return candScoreMap, candPreferenceMap, rankingCount, rankingOffset
-
-    def getWinLoseCandidates(self, candScoreMap, winningQuota):
+    def getWinLoseCandidates(self, cands, scores, winningQuota):
         """
         Returns candidates who gained at least winningQuota worth of votes and
         those with the least positive number of votes.
@@ -96,74 +336,26 @@ class MechanismSTV(Mechanism):
         :rtype set<int> losers: The set of candidates who has the least positive
             amount of votes.
 
-        :ivar dict<int, int> candScoremap: A mapping of candidates to their score.
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        :ivar numpy.ndarray scores: The score of each candidate in cands.
         :ivar int winningQuota: the amount of votes needed to win a seat
         """
-        winners, losers = set(), set()
-        lowestScore = winningQuota
-        for cand,score in candScoreMap.items():
-            if score >= winningQuota:
-                winners.add(cand)
-            elif score < lowestScore and score > 0:
-                lowestScore = score
-                losers = set([cand])
-            elif score == lowestScore:
-                losers.add(cand)
+        scores = scores[:len(cands)]
+        winners = set(cands[i] for i in np.flatnonzero(scores >= winningQuota))
+        losers = set()
+        isLoser = (scores > 0) & (scores < winningQuota)
+        if isLoser.any():
+            lowestScore = scores[isLoser].min()
+            losers = set(cands[i] for i in np.flatnonzero(isLoser & (scores == lowestScore)))
         return winners, losers
 
-
-
-    def reallocLoserVotes(self, candScoreMap, candPreferenceMap, rankingCount,
-                          rankingOffset, loser, noMoreVotesHere, deltaCandScores):
-        """
-        Modifies rankingOffset so that the rankings supporting the just eliminated
-        candidate will support the next non-winning-or-eliminated candidate, or
-        no one if offset reaches the end of the ranking. Also updates candScoreMap,
-        candPreferenceMap, and deltaCandScores to reflect the new scores, and
-        supporting rankings due to one candidate being eliminated. A ranking that
-        supports no candidate is removed from all lists in candPreferenceMap, but
-        not from rankingOffset, and rankingCount.
-
-        .. note:: tupleRanking is equal to tuple<tuple<int>> as returned by
-            convRankingToTuple.
-        :ivar dict<int,int> candScoreMap: A mapping of candidates to their score.
-        :ivar dict<int,list<tupleRanking>> candPreferenceMap: A mapping of each
-            candidate to a list of supporting rankings in tuple form
-        :ivar dict<tupleRanking, int> rankingCount: A mapping of rankings in tuple
-            form to their corresponding count as given by profile.
-        :ivar dict<tupleRanking, int> rankingOffset: A mapping of rankings in tuple
-            form to the their own offset to the currently supproted candidate.
-        """
-        deltaCandScore = {}
-        for ranking in candPreferenceMap[loser]:
-            curOffset = rankingOffset[ranking]
-            oldCand = ranking[curOffset][0]
-            while(curOffset < len(ranking) and \
-                  ranking[curOffset][0] in noMoreVotesHere):
-                curOffset += 1
-            rankingOffset[ranking] = curOffset
-            if curOffset < len(ranking):
-                newCand = ranking[curOffset][0]
-                candPreferenceMap[newCand].append(ranking)
-                candScoreMap[newCand] += rankingCount[ranking]
-                if newCand not in deltaCandScore:
-                    deltaCandScore[newCand] = 0
-                deltaCandScore[newCand] += rankingCount[ranking]
-            candScoreMap[oldCand] -= rankingCount[ranking]
-            if oldCand not in deltaCandScore:
-                deltaCandScore[oldCand] = 0
-            deltaCandScore[oldCand] -= rankingCount[ranking]
-        candPreferenceMap[loser] = []
-        deltaCandScores.append(deltaCandScore)
-
-
     def getCandScoresMap(self, profile):
         """
         Returns a dictionary that associates integer representations of each
-        candidate with their frequency as top ranked candidate or 0 if they were
-        eliminated.
+        candidate with their frequency as top ranked candidate or, if they were
+        eliminated, a negative score that orders them by their round of elimination.
 
-        This function assumes that breakLoserTie(self, losers, deltaCandScores, profile)
+        This function assumes that breakLoserTie(self, losers, roundHistory, profile)
         is implemented for the child MechanismSTV class.
 
         :ivar Profile profile: A Profile object that represents an election profile.
@@ -178,27 +370,65 @@ class MechanismSTV(Mechanism):
 
         winningQuota = self.getWinningQuota(profile)
         numCandidates = profile.numCands
-        candScoreMap, candPreferenceMap, rankingCount, rankingOffset = \
-            self.getInitialCandMaps(profile)
-        roundNum = 0
+        ballots = STVBallots(profile)
+        cands = ballots.cands
+        candIndices = dict((cands[i], i) for i in range(0, numCandidates))
+        self.prepareTieBreak(profile, ballots)
+
+        # A candidate stops recieving votes once she has won or has been eliminated.
+        continuing = np.ones(numCandidates + 1, dtype=bool)
+
+        trace = self.trace
+        if trace is not None:
+            trace.startCount(cands)
 
-        deltaCandScores = []
+        roundHistory = STVRoundHistory(cands, ballots.scores.dtype)
         victoriousCands, eliminatedCands = set(), set()
+        eliminationRounds = dict()
         while(len(victoriousCands) < self.seatsAvailable and \
               len(victoriousCands) + len(eliminatedCands) + 1 < numCandidates):
-            for cand in eliminatedCands:
-                candScoreMap[cand] -= 1
-            winners, losers = self.getWinLoseCandidates(candScoreMap, winningQuota)
-            loser = self.breakLoserTie(losers, deltaCandScores, profile)
+            if trace is not None:
+                roundStart = time.time()
+            roundHistory.addRound(ballots.scores)
+            winners, losers = self.getWinLoseCandidates(cands, ballots.scores, winningQuota)
             victoriousCands = victoriousCands | winners
+
+            # If no candidate with a positive number of votes is below the quota, we stop once the
+            # seats are filled and otherwise eliminate among the continuing candidates with the
+            # fewest votes, who may have none.
+            if len(losers) == 0:
+                if len(victoriousCands) >= self.seatsAvailable:
+                    for cand in winners:
+                        continuing[candIndices[cand]] = False
+                    if trace is not None:
+                        trace.addRound(time.time() - roundStart, sorted(winners), [], [],
+                                       ballots.scores, ballots.piles)
+                    break
+                remaining = [cand for cand in cands
+                             if cand not in victoriousCands and cand not in eliminatedCands]
+                lowestScore = min(ballots.scores[candIndices[cand]] for cand in remaining)
+                losers = set(cand for cand in remaining
+                             if ballots.scores[candIndices[cand]] == lowestScore)
+
+            loser = self.breakLoserTie(losers, roundHistory, profile)
             eliminatedCands = eliminatedCands | {loser}
-            #print('[round %d]'%roundNum,'prefMap:-',candPreferenceMap)
-            #print('[round %d]'%roundNum,'scores:-',candScoreMap,'loser:-',loser,
-            #      'w&l:-',victoriousCands, eliminatedCands)
-            self.reallocLoserVotes(candScoreMap, candPreferenceMap, rankingCount, \
-                                   rankingOffset,loser, \
-                                   victoriousCands | eliminatedCands, deltaCandScores)
-            roundNum+= 1
+            eliminationRounds[loser] = roundHistory.numRounds
+            for cand in winners:
+                continuing[candIndices[cand]] = False
+            continuing[candIndices[loser]] = False
+            deltaScores = ballots.transferPile(candIndices[loser], continuing)
+            if trace is not None:
+                trace.addRound(time.time() - roundStart, sorted(winners), [loser],
+                               [(candIndices[loser], deltaScores)], ballots.scores, ballots.piles)
+
+        # Eliminated candidates are ranked by the round they were eliminated in, below every
+        # candidate that was not eliminated. A candidate eliminated in the last round gets -1, and
+        # each earlier round of elimination is one point lower.
+        candScoreMap = dict()
+        for i in range(0, numCandidates):
+            candScoreMap[cands[i]] = ballots.scores[i].item()
+        for cand in eliminatedCands:
+            candScoreMap[cand] = eliminationRounds[cand] - roundHistory.numRounds - 1
         return candScoreMap
 
 class MechanismSTVForward(MechanismSTV):
@@ -210,38 +440,19 @@ class MechanismSTVForward(MechanismSTV):
         self.maximizeCandScore = True
         self.seatsAvailable = 1
 
-    def breakLoserTie(self, losers, deltaCandScores, profile):
+    def breakLoserTie(self, losers, roundHistory, profile):
         """
         Returns one candidate to be eliminated by foward tie breaking.
 
         :rtype int loser: the candidate to be eliminated this round.
 
         :ivar set<int> losers: A set of candidates who are tied for being eliminated.
-        :ivar list<dict<int,int>> deltaCandScores: A list of the score change for
-            each candidate each round. Candidates whose score did not change for a
-            round would not appear in the dictionary for that round.
+        :ivar STVRoundHistory roundHistory: The scores of every candidate at the start
+            of each round so far, including the current round.
         :ivar Profile profile: A Profile object that represents an election profile.
         """
 
-        curCandScores = self.getInitialCandMaps(profile)[0]
-        curRound = 0
-        while(len(losers)>1 and curRound < len(deltaCandScores)):
-            lowestScore = -1
-            newLosers = set()
-            for loser in losers:
-                score = curCandScores[loser]
-                if score < lowestScore or lowestScore == -1:
-                    lowestScore = score
-                    newLosers = {loser}
-                elif score == lowestScore:
-                    newLosers.add(loser)
-            losers = newLosers
-
-            for cand in losers:
-                if cand not in deltaCandScores[curRound]:
-                    continue
-                curCandScores[cand] += deltaCandScores[curRound][cand]
-            curRound += 1
+        losers = roundHistory.getLowestCands(losers, forward=True)
         return random.choice(list(losers))
 
 class MechanismSTVBackward(MechanismSTV):
@@ -253,33 +464,19 @@ class MechanismSTVBackward(MechanismSTV):
         self.maximizeCandScore = True
         self.seatsAvailable = 1
 
-    def breakLoserTie(self, losers, deltaCandScores, profile):
+    def breakLoserTie(self, losers, roundHistory, profile):
         """
         Returns one candidate to be eliminated by backwards tie breaking.
 
         :rtype int loser: the candidate to be eliminated this round.
 
         :ivar set<int> losers: A set of candidates who are tied for being eliminated.
-        :ivar list<dict<int,int>> deltaCandScores: A list of the score change for
-            each candidate each round. Candidates whose score did not change for a
-            round would not appear in the dictionary for that round.
+        :ivar STVRoundHistory roundHistory: The scores of every candidate at the start
+            of each round so far, including the current round.
         :ivar Profile profile: A Profile object that represents an election profile.
         """
-        curRound = len(deltaCandScores) - 1
-        while(len(losers) > 1 and curRound >= 0):
-            highestChange = -1
-            newLosers = set()
-            for loser in losers:
-                change = 0
-                if loser in deltaCandScores[curRound]:
-                    change = deltaCandScores[curRound][loser]
-                if change > highestChange or highestChange == -1:
-                    highestChange = change
-                    newLosers = {loser}
-                elif change == highestChange:
-                    newLosers.add(loser)
-            losers = newLosers
-            curRound -= 1
+
+        losers = roundHistory.getLowestCands(losers, forward=False)
         return random.choice(list(losers))
 
 class MechanismSTVPosTieBreak(MechanismSTV):
@@ -300,7 +497,7 @@ class MechanismSTVPosTieBreak(MechanismSTV):
 
     def getScoringVector(self,profile):
         """
-        Returns the scoring vector. This function is called by breakLoserTie().
+        Returns the scoring vector. This function is called by prepareTieBreak().
 
         :ivar Profile profile: A Profile object that represents an election profile.
         """
@@ -310,48 +507,33 @@ class MechanismSTVPosTieBreak(MechanismSTV):
         return self.scoringVector
 
 
-    def breakLoserTie(self, losers, deltaCandScores, profile):
+    def prepareTieBreak(self, profile, ballots):
+        """
+        Computes the positional score of every candidate once per count. Eliminated candidates
+        never take part in a tie again, so the scores stay valid for the whole count.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        :ivar STVBallots ballots: The ballots of the election.
+        """
+
+        self.tieBreakScores = self.getPositionalScores(ballots, self.getScoringVector(profile))
+
+    def breakLoserTie(self, losers, roundHistory, profile):
         """
         Returns one candiate to be eliminated by positional tie breaking.
 
         :rtype int loser: the candidate to be eliminated this round.
 
         :ivar set<int> losers: A set of candidates who are tied for being eliminated.
-        :ivar list<dict<int,int>> deltaCandScores: A list of the score change for
-            each candidate each round. Candidates whose score did not change for a
-            round would not appear in the dictionary for that round.
+        :ivar STVRoundHistory roundHistory: The scores of every candidate at the start
+            of each round so far, including the current round.
         :ivar Profile profile: A Profile object that represents an election profile.
         """
 
-        # Initialize our dictionary so all candidate have a score of zero.
-        loserScoresMap = dict()
-        for loser in losers:
-            loserScoresMap[loser] = 0
-        rankMaps = profile.getRankMaps()
-        rankMapCounts = profile.getPreferenceCounts()
-        scoringVector = self.getScoringVector(profile)
-        # Go through the rankMaps of the profile and increment each candidates score appropriately
-        for i in range(0, len(rankMaps)):
-            rankMap = rankMaps[i]
-            rankMapCount = rankMapCounts[i]
-            for cand in rankMap.keys():
-                if cand in losers:
-                    loserScoresMap[cand] += scoringVector[rankMap[cand]-1]*rankMapCount
-        #get a starting value for the lowest score, store losers with that value
-        sampleLoser = losers.pop()
-        loserScore = loserScoresMap[sampleLoser]
-        actualLosers = set()
-        actualLosers.add(sampleLoser)
-        #find the lowest scored losers
-        for loser in losers:
-            currentScore = loserScoresMap[loser]
-            if currentScore < loserScore:
-                loserScore = currentScore
-                actualLosers.clear()
-                actualLosers.add(loser)
-            elif currentScore == loserScore:
-                actualLosers.add(loser)
-        return random.choice(list(actualLosers))
+        # Find the lowest scored losers.
+        loserScore = min(self.tieBreakScores[loser] for loser in losers)
+        actualLosers = [loser for loser in losers if self.tieBreakScores[loser] == loserScore]
+        return random.choice(actualLosers)
 
 class MechanismSTVBorda(MechanismSTVPosTieBreak):
     """
@@ -367,7 +549,7 @@ class MechanismSTVBorda(MechanismSTVPosTieBreak):
         """
         Echos the function of the same name from MechanismBorda.
         Returns the scoring vector [m-1,m-2,m-3,...,0] where m is the number of candidates in the
-election profile. This function is called by breakLoserTie() which is implemented in the
+election profile. This function is called by prepareTieBreak() which is implemented in the
 parent class.
 
         :ivar Profile profile: A Profile object that represents an election profile.
@@ -392,7 +574,7 @@ class MechanismSTVCoombs(MechanismSTVPosTieBreak):
     def getScoringVector(self, profile):
         """
         Echos the function of the same name from MechanismVeto.
-        Returns the scoring vector [1,1,1,...,0]. This function is called by breakLoserTie()
+        Returns the scoring vector [1,1,1,...,0]. This function is called by prepareTieBreak()
         which is implemented in the parent class.
 
         :ivar Profile profile: a Profile object that represents an election profile.
@@ -405,37 +587,407 @@ class MechanismSTVCoombs(MechanismSTVPosTieBreak):
             scoringVector.append(0)
         return scoringVector
 
-class MechanismSTVAll(Mechanism):
+class MechanismSTVMultiSeat(MechanismSTV):
     """
-    The Single Transferable Vote Mechanism, returning all possible winners
-    over all different tie-break combinations.
+    The Single Transferable Vote Mechanism for elections with several seats, in which the
+    surplus votes of elected candidates are transferred at a fractional weight. This class is the
+    parent class for several mechanisms and cannot be constructed directly. All child classes are
+    expected to implement the countVotes() method. Ties for elimination, and between candidates
+    who reach the quota when too few seats are left for all of them, are broken forward, and then
+    at random.
+
+    :ivar int seatsAvailable: The number of candidates to be elected.
     """
 
-    def __init__(self):
+    def __init__(self, seatsAvailable):
         self.maximizeCandScore = True
-        self.seatsAvailable = 1
+        self.seatsAvailable = seatsAvailable
 
-    def getWinningQuota(self, profile):
+    def getWinners(self, profile):
         """
-        Returns an integer that is the minimum number of votes needed to
-        definitively win using Droop quota
+        Returns a list of the elected candidates in the order in which they were elected.
 
         :ivar Profile profile: A Profile object that represents an election profile.
         """
 
-        return (profile.numVoters / (self.seatsAvailable + 1)) + 1
+        return self.countVotes(profile)[0]
+
+    def getCandScoresMap(self, profile):
+        """
+        Returns a dictionary that associates integer representations of each candidate with their
+        final weighted number of votes, or 0 if they were eliminated.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        return self.countVotes(profile)[1]
+
+    def getElecType(self, profile):
+        """
+        Returns the type of the election profile and exits if it is not supported.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        # Currently, we expect the profile to contain an ordering over candidates
+        # with no ties.
+        elecType = profile.getElecType()
+        if elecType != "soc" and elecType != "soi":
+            print("ERROR: unsupported election type")
+            exit()
+        return elecType
+
+    def breakLoserTie(self, losers, roundHistory, profile):
+        """
+        Returns one candidate to be eliminated by foward tie breaking.
+
+        :rtype int loser: the candidate to be eliminated this round.
+
+        :ivar set<int> losers: A set of candidates who are tied for being eliminated.
+        :ivar STVRoundHistory roundHistory: The scores of every candidate at the start
+            of each round so far, including the current round.
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        losers = roundHistory.getLowestCands(losers, forward=True)
+        return random.choice(list(losers))
+
+    def getLowestCands(self, cands, scores, continuing):
+        """
+        Returns the set of continuing candidates with the lowest score.
 
-    def getInitialRankMaps(self, profile):
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        :ivar numpy.ndarray scores: The score of each candidate in cands.
+        :ivar numpy.ndarray continuing: True for each candidate in cands who is still in the count.
         """
-        Returns a multi-part representation of the election profile referenced by
-        profile.
 
+        continuingScores = scores[:len(cands)][continuing[:len(cands)]]
+        isLowest = continuing[:len(cands)] & (scores[:len(cands)] == continuingScores.min())
+        return set(cands[i] for i in np.flatnonzero(isLowest))
+
+    def getElectedCands(self, cands, reached, scores, seatsLeft, roundHistory, profile):
+        """
+        Returns an array with the indices of the candidates who are elected this round, highest
+        score first, and a list with the indices of those who are not elected because the seats
+        ran out. If more candidates reached the quota than seats are left, the candidates tied at
+        the lowest score that still wins a seat are removed one at a time by breakLoserTie().
+
+        :ivar list<int> cands: Contains integer representations of each candidate.
+        :ivar numpy.ndarray reached: The indices of the candidates who reached the quota.
+        :ivar numpy.ndarray scores: The score of each candidate index.
+        :ivar int seatsLeft: The number of seats that are not filled yet.
+        :ivar STVRoundHistory roundHistory: The scores of every candidate at the start
+            of each round so far, including the current round.
         :ivar Profile profile: A Profile object that represents an election profile.
         """
-        allCands = list(profile.candMap.keys())
-        rankMaps = profile.getReverseRankMaps()
-        rankMapCounts = profile.getPreferenceCounts()
-        return rankMaps, rankMapCounts
+
+        reached = reached[np.argsort(-scores[reached], kind="mergesort")]
+        if len(reached) <= seatsLeft:
+            return reached, []
+
+        cutoff = scores[reached[seatsLeft - 1]]
+        tied = set(cands[i] for i in reached if scores[i] == cutoff)
+        numAbove = int(np.sum(scores[reached] > cutoff))
+        notElected = []
+        while len(tied) > seatsLeft - numAbove:
+            loser = self.breakLoserTie(tied, roundHistory, profile)
+            tied.remove(loser)
+            notElected.append(cands.index(loser))
+        return reached[~np.isin(reached, notElected)], notElected
+
+class MechanismSTVGregory(MechanismSTVMultiSeat):
+    """
+    Multi-seat Single Transferable Vote with weighted inclusive Gregory surplus transfers. When a
+    candidate reaches the Droop quota, every ballot in her pile is transferred to its next
+    continuing candidate at its current weight times the fraction of her votes that is surplus.
+    """
+
+    def countVotes(self, profile):
+        """
+        Returns a list of the elected candidates in the order in which they were elected and a
+        dictionary that associates integer representations of each candidate with their final
+        weighted number of votes, or 0 if they were eliminated.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        self.getElecType(profile)
+        winningQuota = self.getWinningQuota(profile)
+        ballots = STVBallots(profile, weighted=True)
+        cands = ballots.cands
+        numCandidates = len(cands)
+        candIndices = dict((cands[i], i) for i in range(0, numCandidates))
+        continuing = np.ones(numCandidates + 1, dtype=bool)
+        roundHistory = STVRoundHistory(cands, float)
+        trace = self.trace
+        if trace is not None:
+            trace.startCount(cands)
+
+        electedCands = []
+        while len(electedCands) < self.seatsAvailable:
+            continuingCands = np.flatnonzero(continuing[:numCandidates])
+            if len(continuingCands) == 0:
+                break
+
+            # If there are no more candidates than seats left, they are all elected.
+            if len(electedCands) + len(continuingCands) <= self.seatsAvailable:
+                order = np.argsort(-ballots.scores[continuingCands], kind="mergesort")
+                electedCands += [cands[i] for i in continuingCands[order]]
+                if trace is not None:
+                    trace.addRound(0.0, [cands[i] for i in continuingCands[order]], [], [],
+                                   ballots.scores, ballots.piles)
+                break
+
+            if trace is not None:
+                roundStart = time.time()
+            roundHistory.addRound(ballots.scores)
+            scores = ballots.scores[continuingCands]
+            reached = continuingCands[scores >= winningQuota]
+            transfers = []
+            if len(reached) > 0:
+
+                # Elect everyone who reached the quota, highest first, and then transfer each
+                # surplus by scaling the weight of every ballot in the pile. Candidates who
+                # reached the quota after the seats ran out are eliminated.
+                reached, notElected = self.getElectedCands(
+                    cands, reached, ballots.scores, self.seatsAvailable - len(electedCands),
+                    roundHistory, profile)
+                continuing[reached] = False
+                continuing[notElected] = False
+                for cand in reached:
+                    electedCands.append(cands[cand])
+                    score = ballots.scores[cand]
+                    ballots.counts[ballots.piles[cand]] *= (score - winningQuota)/score
+                    transfers.append((cand, ballots.transferPile(cand, continuing)))
+                    ballots.scores[cand] = winningQuota
+                for cand in notElected:
+                    transfers.append((cand, ballots.transferPile(cand, continuing)))
+                roundElected = [cands[i] for i in reached]
+                roundEliminated = [cands[i] for i in notElected]
+            else:
+                losers = self.getLowestCands(cands, ballots.scores, continuing)
+                loser = candIndices[self.breakLoserTie(losers, roundHistory, profile)]
+                continuing[loser] = False
+                transfers.append((loser, ballots.transferPile(loser, continuing)))
+                roundElected, roundEliminated = [], [cands[loser]]
+            if trace is not None:
+                trace.addRound(time.time() - roundStart, roundElected, roundEliminated, transfers,
+                               ballots.scores, ballots.piles)
+
+        candScoreMap = dict()
+        for i in range(0, numCandidates):
+            candScoreMap[cands[i]] = ballots.scores[i].item()
+        return electedCands, candScoreMap
+
+class MechanismSTVMeek(MechanismSTVMultiSeat):
+    """
+    Multi-seat Single Transferable Vote by Meek's method. Every candidate has a keep value, the
+    fraction of the weight reaching her that she keeps. Hopeful candidates keep everything,
+    eliminated candidates keep nothing, and the keep values of elected candidates are iterated
+    until each keeps exactly the quota. The quota is recalculated from the non-exhausted votes,
+    and a hopeful candidate is elected once her votes exceed it.
+
+    :ivar int seatsAvailable: The number of candidates to be elected.
+    :ivar float tolerance: The largest relative difference between the votes of an elected
+        candidate and the quota at which the keep values are considered converged.
+    :ivar int maxIters: The largest number of keep value updates per round.
+    :ivar bool converged: False if the keep values failed to converge within maxIters updates
+        in some round of the last count.
+    """
+
+    def __init__(self, seatsAvailable, tolerance = 1e-6, maxIters = 1000):
+        self.maximizeCandScore = True
+        self.seatsAvailable = seatsAvailable
+        self.tolerance = tolerance
+        self.maxIters = maxIters
+        self.converged = True
+
+    def convergeKeepValues(self, ballots, keepValues, elected):
+        """
+        Updates the keep values of the elected candidates, in place, until each keeps the quota,
+        and returns the votes of each candidate index and of the exhausted pile and the quota.
+        If they do not converge within maxIters updates, a warning is printed and converged is
+        set to False.
+
+        :ivar STVBallots ballots: The ballots of the election.
+        :ivar numpy.ndarray keepValues: The keep value of each candidate index and of the
+            exhausted pile.
+        :ivar numpy.ndarray elected: A boolean array that is True for the elected candidates.
+        """
+
+        numCandidates = len(ballots.cands)
+        for i in range(0, self.maxIters + 1):
+            votes = self.distributeVotes(ballots, keepValues)
+            quota = (votes.sum() - votes[numCandidates])/(self.seatsAvailable + 1)
+            if not elected.any() or \
+               np.all(np.abs(votes[elected] - quota) <= self.tolerance*quota):
+                return votes, quota
+            if i < self.maxIters:
+                keepValues[elected] *= quota/votes[elected]
+
+        print("WARNING: Meek keep values did not converge in %d iterations" % self.maxIters)
+        self.converged = False
+        return votes, quota
+
+    def distributeVotes(self, ballots, keepValues):
+        """
+        Returns an array with the votes of each candidate index and of the exhausted pile when
+        every ballot passes down its ranking and each candidate keeps her share of the weight
+        that reaches her.
+
+        :ivar STVBallots ballots: The ballots of the election.
+        :ivar numpy.ndarray keepValues: The keep value of each candidate index and of the
+            exhausted pile, which must be 1.
+        """
+
+        numPiles = len(keepValues)
+        remaining = ballots.counts.copy()
+        votes = np.zeros(numPiles)
+        for column in range(0, ballots.ballots.shape[1]):
+            cands = ballots.ballots[:, column]
+            kept = remaining*keepValues[cands]
+            votes += np.bincount(cands, weights=kept, minlength=numPiles)
+            remaining -= kept
+        return votes
+
+    def countVotes(self, profile):
+        """
+        Returns a list of the elected candidates in the order in which they were elected and a
+        dictionary that associates integer representations of each candidate with their final
+        weighted number of votes, or 0 if they were eliminated.
+
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
+
+        self.getElecType(profile)
+        ballots = STVBallots(profile, weighted=True)
+        cands = ballots.cands
+        numCandidates = len(cands)
+        candIndices = dict((cands[i], i) for i in range(0, numCandidates))
+        keepValues = np.ones(numCandidates + 1)
+        hopeful = np.ones(numCandidates + 1, dtype=bool)
+        hopeful[numCandidates] = False
+        elected = np.zeros(numCandidates + 1, dtype=bool)
+        roundHistory = STVRoundHistory(cands, float)
+        trace = self.trace
+        if trace is not None:
+            trace.startCount(cands)
+
+        self.converged = True
+        electedCands = []
+        while len(electedCands) < self.seatsAvailable:
+            if trace is not None:
+                roundStart = time.time()
+
+            # Update the keep values of the elected candidates until each keeps the quota.
+            votes, quota = self.convergeKeepValues(ballots, keepValues, elected)
+
+            hopefulCands = np.flatnonzero(hopeful)
+            if len(hopefulCands) == 0:
+                break
+
+            # If there are no more candidates than seats left, they are all elected.
+            if len(electedCands) + len(hopefulCands) <= self.seatsAvailable:
+                order = np.argsort(-votes[hopefulCands], kind="mergesort")
+                electedCands += [cands[i] for i in hopefulCands[order]]
+                if trace is not None:
+                    trace.addRound(time.time() - roundStart,
+                                   [cands[i] for i in hopefulCands[order]], [], [], votes)
+                break
+
+            # A candidate is elected once her votes exceed the quota, so at most as many
+            # candidates as there are seats can be elected. If rounding lets more reach it than
+            # seats are left, the rest are eliminated.
+            roundHistory.addRound(votes)
+            reached = hopefulCands[votes[hopefulCands] > quota]
+            if len(reached) > 0:
+                reached, notElected = self.getElectedCands(
+                    cands, reached, votes, self.seatsAvailable - len(electedCands),
+                    roundHistory, profile)
+                electedCands += [cands[i] for i in reached]
+                hopeful[reached] = False
+                elected[reached] = True
+                hopeful[notElected] = False
+                keepValues[notElected] = 0.0
+                roundElected = [cands[i] for i in reached]
+                roundEliminated = [cands[i] for i in notElected]
+            else:
+                losers = self.getLowestCands(cands, votes, hopeful)
+                loser = candIndices[self.breakLoserTie(losers, roundHistory, profile)]
+                hopeful[loser] = False
+                keepValues[loser] = 0.0
+                roundElected, roundEliminated = [], [cands[loser]]
+
+
+            # Meek's method redistributes every ballot each round instead of transferring piles,
+            # so only the scores of each round are recorded.
+            if trace is not None:
+                trace.addRound(time.time() - roundStart, roundElected, roundEliminated, [], votes)
+
+        # The scores are those of the final keep values, once the last elected candidates also
+        # keep only the quota.
+        votes, quota = self.convergeKeepValues(ballots, keepValues, elected)
+        candScoreMap = dict()
+        for i in range(0, numCandidates):
+            candScoreMap[cands[i]] = votes[i].item()
+        return electedCands, candScoreMap
+
+class MechanismSTVAll(MechanismSTV):
+    """
+    The Single Transferable Vote Mechanism, returning all possible winners
+    over all different tie-break combinations.
+
+    The count is searched as a graph whose states are the sets of eliminated
+    candidates, so a set that is reached by eliminating the same candidates in
+    different orders is only explored once.
+
+    :ivar int maxStates: The largest number of states to explore, or None for
+        no limit.
+    :ivar float timeLimit: The largest number of seconds to search for, or None
+        for no limit.
+    :ivar int numProcesses: The number of worker processes that evaluate the
+        states of each level of the search, or None to search in this process.
+    :ivar int statesPerProcess: The number of states each worker process
+        evaluates between checks of maxStates and timeLimit.
+    :ivar bool searchComplete: False if the last search stopped at maxStates or
+        timeLimit, in which case only some of the possible winners are known and
+        the other candidates score 0 whether or not they could win.
+    :ivar int numStatesExplored: The number of states explored by the last search.
+    """
+
+    def __init__(self, maxStates = None, timeLimit = None, numProcesses = None,
+                 statesPerProcess = 64):
+        self.maximizeCandScore = True
+        self.seatsAvailable = 1
+        self.maxStates = maxStates
+        self.timeLimit = timeLimit
+        self.numProcesses = numProcesses
+        self.statesPerProcess = statesPerProcess
+        self.searchComplete = True
+        self.numStatesExplored = 0
+
+    def getStateWinLoseCandidates(self, ballots, eliminated, winningQuota):
+        """
+        Returns the indices of the candidates who have won and of the candidates
+        who are tied for being eliminated once the candidates in eliminated are
+        out of the count.
+
+        :ivar STVBallots ballots: The ballots of the election.
+        :ivar int eliminated: A bitmask of the indices of the eliminated candidates.
+        :ivar float winningQuota: minimum value needed to be winner
+        """
+
+        numCands = len(ballots.cands)
+        continuing = np.ones(numCands + 1, dtype=bool)
+        for i in range(0, numCands):
+            if (eliminated >> i) & 1:
+                continuing[i] = False
+
+        # Every ranking supports its first continuing candidate, or the exhausted pile.
+        firstContinuing = np.argmax(continuing[ballots.ballots], axis=1)
+        tops = ballots.ballots[np.arange(len(ballots.ballots)), firstContinuing]
+        scores = np.bincount(tops, weights=ballots.counts, minlength=numCands + 1)
+        return self.getWinLoseCandidates(list(range(0, numCands)), scores, winningQuota)
 
     def getCandScoresMap(self, profile):
         """
@@ -454,108 +1006,106 @@ class MechanismSTVAll(Mechanism):
             exit()
 
         winningQuota = self.getWinningQuota(profile)
-        # print("Winning quota is %d votes" % winningQuota)
-        numCandidates = profile.numCands
-        rankMaps, rankMapCounts = self.getInitialRankMaps(profile)
-
-        rankingOffset = [1 for i in rankMapCounts]
-        roundNum = 1
-
-        victoriousCands = set()
-        eliminatedCandsList = [set()]
-        rankingOffsets = [rankingOffset]
-        while roundNum < numCandidates:
-            # print("\n\nRound %d\t\t" % roundNum)
-            newRankingOffsets = []
-            newEliminatedCandsList = []
-            for i in range(len(rankingOffsets)):
-                rankingOffset = rankingOffsets[i]
-                winners, losers = self.getWinLoseCandidates(rankMaps, rankMapCounts, rankingOffset, winningQuota)
-                victoriousCands = victoriousCands | winners
-                # print("\tWinners: %s" % victoriousCands)
-                # print("\tEliminated so far: %s" % eliminatedCandsList[i])
-                if len(winners) > 0:
-                    continue
-
-                # if len(losers) > 1:
-                #     print("\t\t%s are tied" % losers)
-                # else:
-                #     print("\t\t%s is loser" % losers)
-                for loser in losers:
-                    newEliminatedCands = eliminatedCandsList[i] | {loser}
-                    # print("\t\tCands eliminated: %s" % newEliminatedCands)
-                    nextRankingOffset = self.reallocLoserVotes(rankMaps, rankMapCounts, rankingOffset, newEliminatedCands)
-                    newEliminatedCandsList.append(newEliminatedCands)
-                    newRankingOffsets.append(nextRankingOffset)
-            rankingOffsets = newRankingOffsets
-            eliminatedCandsList = newEliminatedCandsList
-            roundNum+= 1
-        allCands = set(profile.candMap.keys())
+        ballots = STVBallots(profile)
+        numCandidates = len(ballots.cands)
+        allCands = (1 << numCandidates) - 1
+        startTime = time.time()
+
+        # States are evaluated in batches. With worker processes, each batch is split among the
+        # workers, which share the ballots and only recieve and return small state descriptions.
+        pool = None
+        batchSize = 1
+        if self.numProcesses != None and self.numProcesses > 1:
+            pool = multiprocessing.Pool(self.numProcesses, initializer=_initSTVAllWorker,
+                                        initargs=(self, ballots, winningQuota))
+            batchSize = self.numProcesses*self.statesPerProcess
+
+        self.searchComplete = True
+        self.numStatesExplored = 0
+        possibleWinners = 0
+        visited = set([0])
+        frontier = [0]
+        try:
+            while len(frontier) > 0 and self.searchComplete:
+                nextFrontier = []
+                for start in range(0, len(frontier), batchSize):
+                    batch = []
+                    for eliminated in frontier[start:start+batchSize]:
+                        if (self.maxStates != None and \
+                            self.numStatesExplored >= self.maxStates) or \
+                           (self.timeLimit != None and \
+                            time.time() - startTime >= self.timeLimit):
+                            self.searchComplete = False
+                            break
+
+                        # A state can only lead to the candidates that are still in it winning,
+                        # so we skip it if all of them are already known to be possible winners.
+                        continuing = allCands & ~eliminated
+                        if continuing & ~possibleWinners == 0:
+                            continue
+                        self.numStatesExplored += 1
+
+                        # The last remaining candidate wins.
+                        if continuing & (continuing - 1) == 0:
+                            possibleWinners |= continuing
+                            continue
+                        batch.append(eliminated)
+
+                    if pool != None:
+                        outcomes = pool.map(_getSTVAllStateOutcome, batch,
+                                            max(1, len(batch)//self.numProcesses))
+                    else:
+                        outcomes = [self.getStateWinLoseCandidates(ballots, eliminated, \
+                                                                   winningQuota) \
+                                    for eliminated in batch]
+
+                    for eliminated, (winners, losers) in zip(batch, outcomes):
+                        if len(winners) > 0:
+                            for cand in winners:
+                                possibleWinners |= 1 << cand
+                            continue
+
+                        # If no continuing candidate has any votes left, they all remain tied.
+                        if len(losers) == 0:
+                            possibleWinners |= allCands & ~eliminated
+                            continue
+                        for loser in losers:
+                            nextState = eliminated | (1 << loser)
+                            if nextState not in visited:
+                                visited.add(nextState)
+                                nextFrontier.append(nextState)
+                    if not self.searchComplete:
+                        break
+                frontier = nextFrontier
+        finally:
+            if pool != None:
+                pool.terminate()
 
         candScoreMap = {}
-        for eliminatedCands in eliminatedCandsList:
-            for cand in eliminatedCands:
-                candScoreMap[cand] = 0
-            # Add candidates remaining in last round as victorious
-            victoriousCands = victoriousCands | (allCands - eliminatedCands)
-        for cand in victoriousCands:
-            candScoreMap[cand] = 1
+        for i in range(0, numCandidates):
+            candScoreMap[ballots.cands[i]] = (possibleWinners >> i) & 1
         return candScoreMap
 
-    def getWinLoseCandidates(self, rankMaps, rankMapCounts, rankingOffset, winningQuota):
-        """
-        Returns all candidates who have won by passing the winning quota and all who have tied for lowest score.
-
-        :ivar list<dict<int, list<int>>> rankMaps: List of rankings in dict form, where dict maps placement to list of candidates.
-        :ivar list<int> rankMapCounts: Count of votes in corresponding entry of rankMaps
-        :ivar list<int> rankingOffset: Index of top remaining candidate in corresponding entry of rankMaps
-        :ivar int winningQuota: minimum value needed to be winner
-        """
-        candScores = {}
-        # calculate scores
-        for i in range(len(rankMaps)):
-            ranking = rankMaps[i]
-            offset = rankingOffset[i]
-            cands = ranking[offset]
-            for cand in cands:
-                if cand not in candScores:
-                    candScores[cand] = 0
-                candScores[cand] += rankMapCounts[i]
-        # print(candScores)
-        # find winners and losers
-        winners = set()
-        losers = set()
-        minScore = min(candScores.values())
-        for cand in candScores:
-            score = candScores[cand]
-            if score >= winningQuota:
-                winners.add(cand)
-            if score == minScore:
-                losers.add(cand)
+    def getWinners(self, profile):
+        """
+        Returns a list of the candidates who win in some case. If the search
+        stopped at maxStates or timeLimit, searchComplete is False and the list
+        only holds the possible winners found so far, which may be none of them.
 
-        return winners, losers
+        :ivar Profile profile: A Profile object that represents an election profile.
+        """
 
-    def reallocLoserVotes(self, rankMaps, rankMapCounts, rankingOffset, eliminatedCands):
-        """
-        Makes new rankingOffset based on who has been eliminated.
-
-        :ivar list<dict<int, list<int>>> rankMaps: List of rankings in dict form, where dict maps placement to list of candidates.
-        :ivar list<int> rankMapCounts: Count of votes in corresponding entry of rankMaps
-        :ivar list<int> rankingOffset: Index of top remaining candidate in corresponding entry of rankMaps
-        :ivar set<int> eliminatedCandidates: Set of candidates that have been eliminated
-        """
-        newRankingOffset = [i for i in rankingOffset]
-        i = 0;
-        while i < len(rankMaps):
-            ranking = rankMaps[i]
-            offset = newRankingOffset[i]
-            cands = ranking[offset]
-            nonLoserCands = []
-            for cand in cands:
-                if cand not in eliminatedCands:
-                    nonLoserCands.append(cand)
-            if len(nonLoserCands) == 0:
-                newRankingOffset[i] = offset + 1
-            else:
-                i += 1
-        return newRankingOffset
+        candScores = self.getCandScoresMap(profile)
+        return [cand for cand in candScores.keys() if candScores[cand] == 1]
+
+# The ballots are handed to each worker process once, when the process starts, and are only read
+# afterwards.
+_stvAllWorkerArgs = None
+
+def _initSTVAllWorker(mechanism, ballots, winningQuota):
+    global _stvAllWorkerArgs
+    _stvAllWorkerArgs = (mechanism, ballots, winningQuota)
+
+def _getSTVAllStateOutcome(eliminated):
+    mechanism, ballots, winningQuota = _stvAllWorkerArgs
+    return mechanism.getStateWinLoseCandidates(ballots, eliminated, winningQuota)
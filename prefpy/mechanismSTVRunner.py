@@ -33,15 +33,17 @@ def electionFileToProfile(file):
     return Profile(candMap, preferences)
             
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python3 -m prefpy.mechanismSTVRunner tests/<any test file>\n",
+    if len(sys.argv) != 2 and len(sys.argv) != 3:
+        print("Usage: python3 -m prefpy.mechanismSTVRunner tests/<any test file> [<trace file>]\n",
               ''' input file follows the election data format described at (http://www.preflib.org/data/format.php#election-data):
     * <number of candidates>
     * <candidate number; e.g. 1>,<candidate name; e.g. apple>
     * ... //until all candidates listed
     * <total number of voters>,<sum of vote count;usually same as total number of votes>,<number of unique rankings>
     * <number of votes with this ranking>,<ranking;e.g. 1,2,3,4>
-    * ... //until all unique rankings are listed''')
+    * ... //until all unique rankings are listed
+ the optional trace file receives the rounds of the forward tie breaking count as csv if its
+ name ends in .csv, and as json otherwise''')
         exit()
     profile = electionFileToProfile(sys.argv[1])
 
@@ -49,8 +51,15 @@ if __name__ == "__main__":
 
     t0 = time.time()
     stv = mechanismSTV.MechanismSTVForward()
+    if len(sys.argv) == 3:
+        stv.trace = mechanismSTV.STVTrace()
     winners = stv.getWinners(profile)
     t1 = (time.time() - t0) * 1000000.0
+    if len(sys.argv) == 3:
+        if sys.argv[2].endswith(".csv"):
+            stv.trace.exportCsvFile(sys.argv[2])
+        else:
+            stv.trace.exportJsonFile(sys.argv[2])
     print("\n\n")
     print("Using STV with forward tie breaking")
     print(winners)
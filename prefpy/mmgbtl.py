@@ -5,7 +5,6 @@
 import numpy as np
 from . import aggregate
 from . import plackettluce as pl
-from . import util
 
 
 class MMPLAggregator(aggregate.RankAggregator):
@@ -21,24 +20,13 @@ class MMPLAggregator(aggregate.RankAggregator):
             estimate of the ground-truth parameters, gamma for
             the given data.
         Parameters:
-            rankings:  set of rankings to aggregate
+            rankings:  set of rankings to aggregate, or their RankingStats
             epsilon:   convergence condition value, set to None for iteration only
             max_iters: maximum number of iterations of MM algorithm
         """
 
         # compute the matrix w, the numbers of pairwise wins:
-        w = np.zeros((self.m, self.m))
-        for ranking in rankings:
-            localw = np.zeros((self.m, self.m))
-            for ind1, alt1 in enumerate(self.alts):
-                for ind2, alt2 in enumerate(self.alts):
-                    if ind1 == ind2:
-                        continue
-                    alt1_rank = util.get_index_nested(ranking, alt1)
-                    alt2_rank = util.get_index_nested(ranking, alt2)
-                    if alt1_rank < alt2_rank: # alt 1 is ranked higher
-                        localw[ind1][ind2] = 1
-            w += localw
+        w = self.get_ranking_stats(rankings).get_pairwise_counts()
         W = w.sum(axis=1)
 
         # gamma_t is the value of gamma at time = t
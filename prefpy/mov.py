@@ -4,12 +4,14 @@ Author: Kevin J. Hwang
 import io
 import math
 import itertools
+import numpy as np
 from .preference import Preference
 
 def movPosScoring(profile, scoringVector):
     """
-    Returns an integer that is equal to the margin of victory of a profile, that is, the number of
-    votes needed to be changed to change to winner when using the positional scoring rule.
+    Returns an integer that is an upper bound on the margin of victory of a profile, that is, the
+    number of votes needed to be changed so that the winner is no longer the unique winner when
+    using the positional scoring rule. If the profile already results in a draw, the margin is 0.
 
     :ivar Profile profile: A Profile object that represents an election profile.
     :ivar list<int> scoringVector: A list of integers (or floats) that give the scores assigned to
@@ -27,7 +29,7 @@ def movPosScoring(profile, scoringVector):
     posScoring = mechanism.MechanismPosScoring(scoringVector)
     winners = posScoring.getWinners(profile)
     if len(winners) > 1:
-        return 1
+        return 0
 
     rankMaps = profile.getRankMaps()
     preferenceCounts = profile.getPreferenceCounts()
@@ -60,9 +62,9 @@ def movPosScoring(profile, scoringVector):
             ttlChange = scoreEffect[0] + scoreEffect[1]
 
 
-            # Check if changing all instances of the current vote can change the winner.
+            # Check if changing all instances of the current vote can tie the winner.
             if (ttlChange*scoreEffect[2] >= winnerScore-candScore):
-                votesNeeded += math.ceil(float(winnerScore-candScore)/float(ttlChange))+1
+                votesNeeded += math.ceil(float(winnerScore-candScore)/float(ttlChange))
                 break
 
             # Otherwise, update the election simulation with the effects of the current votes.
@@ -99,8 +101,8 @@ def movPlurality(profile):
 
 def movVeto(profile):
     """
-    Returns an integer that is equal to the margin of victory, that is, the number of votes needed
-    to be changed to change the winner when using the veto rule.
+    Returns an integer that is an upper bound on the margin of victory, that is, the number of votes
+    needed to be changed so that the winner is no longer the unique winner when using the veto rule.
 
     :ivar Profile profile: A Profile object that represents an election profile.
     """
@@ -113,8 +115,9 @@ def movVeto(profile):
 
 def movBorda(profile):
     """
-    Returns an integer that is equal to the margin of victory, that is, the number of votes needed
-    to be changed to change the winner when using the veto rule.
+    Returns an integer that is an upper bound on the margin of victory, that is, the number of votes
+    needed to be changed so that the winner is no longer the unique winner when using the Borda
+    rule.
 
     :ivar Profile profile: A Profile object that represents an election profile.
     """
@@ -129,8 +132,9 @@ def movBorda(profile):
 
 def movKApproval(profile, k):
     """
-    Returns an integer that is equal to the margin of victory, that is, the number of votes needed
-    to be changed to change the winner when using the k-approval rule.
+    Returns an integer that is an upper bound on the margin of victory, that is, the number of votes
+    needed to be changed so that the winner is no longer the unique winner when using the k-approval
+    rule.
 
     :ivar Profile profile: A Profile object that represents an election profile.
     :ivar int k: A value for k.
@@ -144,8 +148,10 @@ def movKApproval(profile, k):
 
 def movSimplifiedBucklin(profile):
     """
-    Returns an integer that is equal to the margin of victory of the election profile, that is,
-    the number of votes needed to be changed to change the winner.
+    Returns an integer that is an upper bound on the margin of victory of the election profile,
+    that is, the number of votes needed to be changed so that the winner is no longer the unique
+    winner when using the simplified Bucklin rule. If the profile already results in a draw, the
+    margin is 0.
 
     :ivar Profile profile: A Profile object that represents an election profile.
     """
@@ -157,10 +163,11 @@ def movSimplifiedBucklin(profile):
         exit()
         
     # See if the election ends in a tie. If so, the mov is 0.
+    from . import mechanism
     bucklin = mechanism.MechanismSimplifiedBucklin()
     winners = bucklin.getWinners(profile)
     if len(winners) > 1:
-        return 1
+        return 0
 
     rankMaps = profile.getRankMaps()
     preferenceCounts = profile.getPreferenceCounts()
@@ -208,5 +215,263 @@ def movSimplifiedBucklin(profile):
             
     return int(mov)
 
+def getPositionMatrix(profile):
+    """
+    Returns a list of the integer representations of the candidates, a two-dimensional array with
+    one row for each preference that contains the position of each candidate in the preference,
+    and an array of the number of times each preference is given. The columns of the position
+    array follow the order of the returned candidate list and tied candidates share a position.
+
+    :ivar Profile profile: A Profile object that represents an election profile.
+    """
+
+    cands = sorted(profile.candMap.keys())
+    rankMaps = profile.getRankMaps()
+    positions = np.empty((len(rankMaps), len(cands)), dtype=np.int64)
+    for i in range(0, len(rankMaps)):
+        rankMap = rankMaps[i]
+        positions[i] = [rankMap[cand] for cand in cands]
+    counts = np.array(profile.getPreferenceCounts(), dtype=np.int64)
+    return cands, positions, counts
+
+def getPairwiseCountMatrix(positions, counts):
+    """
+    Returns a two-dimensional array that associates every pair of candidate indices, i and j, with
+    the number of voters who rank candidate i strictly above candidate j. The pairwise margin
+    matrix is this array minus its transpose.
+
+    :ivar numpy.ndarray positions: The position of each candidate in each preference, as returned
+        by getPositionMatrix().
+    :ivar numpy.ndarray counts: The number of times each preference is given.
+    """
+
+    numCands = positions.shape[1]
+    pairwise = np.zeros((numCands, numCands), dtype=np.int64)
+    for i in range(0, numCands):
+        pairwise[i] = counts.dot(positions[:, i:i+1] < positions)
+    return pairwise
+
+def copelandScores(pairwise, alpha):
+    """
+    Returns an array of the Copeland score of each candidate index given the pairwise count matrix.
+
+    :ivar numpy.ndarray pairwise: A pairwise count matrix as returned by getPairwiseCountMatrix().
+    :ivar float alpha: The score a candidate recieves for each pairwise tie.
+    """
+
+    margins = pairwise - pairwise.T
+    wins = (margins > 0).sum(axis=1)
+    ties = (margins == 0).sum(axis=1) - 1
+    return wins + alpha*ties
+
+def maximinScores(pairwise):
+    """
+    Returns an array of the maximin score of each candidate index given the pairwise count matrix.
+
+    :ivar numpy.ndarray pairwise: A pairwise count matrix as returned by getPairwiseCountMatrix().
+    """
+
+    margins = (pairwise - pairwise.T).astype(float)
+    np.fill_diagonal(margins, float("inf"))
+    return margins.min(axis=1)
+
+def schulzeStrongestPaths(pairwise):
+    """
+    Returns a two-dimensional array that associates every pair of candidate indices, i and j, with
+    the strength of the strongest path from i to j, computed with a vectorized Floyd-Warshall.
+    This matches MechanismSchulze.computeStrongestPaths() on the same pairwise preferences.
+
+    :ivar numpy.ndarray pairwise: A pairwise count matrix as returned by getPairwiseCountMatrix().
+    """
+
+    strongestPaths = np.where(pairwise > pairwise.T, pairwise, 0)
+    np.fill_diagonal(strongestPaths, 0)
+    for k in range(0, len(pairwise)):
+        strongestPaths = np.maximum(strongestPaths,
+                                    np.minimum(strongestPaths[:, k:k+1], strongestPaths[k:k+1, :]))
+    return strongestPaths
+
+def schulzeScores(pairwise):
+    """
+    Returns an array that contains, for each candidate index, the number of other candidates for
+    which her strongest path is at least as strong as theirs, as in MechanismSchulze.
+
+    :ivar numpy.ndarray pairwise: A pairwise count matrix as returned by getPairwiseCountMatrix().
+    """
+
+    strongestPaths = schulzeStrongestPaths(pairwise)
+    return (strongestPaths >= strongestPaths.T).sum(axis=1) - 1
+
+def movPairwiseGreedy(positions, counts, pairwise, winner, isBeaten):
+    """
+    Returns an integer that is an upper bound on the number of votes that need to be changed so
+    that the candidate at index winner is no longer the unique winner, that is, so that the outcome
+    becomes a draw or another candidate wins, for a rule that only depends on pairwise comparisons.
+
+    For each challenger c, we change votes to rank c first and the winner last, which can only
+    improve the pairwise comparisons of c and only worsen those of the winner. We change the votes
+    with the greatest number of affected pairs first and update the pairwise count matrix
+    incrementally instead of running the mechanism again. Since isBeaten is monotone in the number
+    of changed copies of a preference, the exact number of copies needed is found by binary search.
+
+    :ivar numpy.ndarray positions: The position of each candidate in each preference, as returned
+        by getPositionMatrix().
+    :ivar numpy.ndarray counts: The number of times each preference is given.
+    :ivar numpy.ndarray pairwise: A pairwise count matrix as returned by getPairwiseCountMatrix().
+    :ivar int winner: The index of the current unique winner.
+    :ivar function isBeaten: A function that takes a pairwise count matrix, the challenger index,
+        and the winner index and returns True if the winner is no longer the unique winner.
+    """
+
+    numCands = len(pairwise)
+    mov = int(counts.sum())
+    for cand in range(0, numCands):
+        if cand == winner:
+            continue
+
+        # For each preference, find the candidates that pass the challenger and the candidates that
+        # the winner falls behind when the challenger is moved to the top and the winner to the
+        # bottom.
+        aboveCand = positions < positions[:, cand:cand+1]
+        tiedCand = positions == positions[:, cand:cand+1]
+        tiedCand[:, cand] = False
+        belowWinner = positions > positions[:, winner:winner+1]
+        tiedWinner = positions == positions[:, winner:winner+1]
+        tiedWinner[:, winner] = False
+        belowWinner[:, cand] = False
+        tiedWinner[:, cand] = False
+        candGains = aboveCand | tiedCand
+        winnerLosses = belowWinner | tiedWinner
+
+        impacts = candGains.sum(axis=1) + winnerLosses.sum(axis=1)
+        order = np.argsort(-impacts, kind="mergesort")
+
+        def changeVotes(currPairwise, i, numVotes):
+            newPairwise = currPairwise.copy()
+            newPairwise[cand] += numVotes*candGains[i]
+            newPairwise[:, cand] -= numVotes*aboveCand[i]
+            newPairwise[:, winner] += numVotes*winnerLosses[i]
+            newPairwise[winner] -= numVotes*belowWinner[i]
+            return newPairwise
+
+        currPairwise = pairwise
+        votesNeeded = 0
+        for i in order:
+            if impacts[i] == 0:
+                break
+            nextPairwise = changeVotes(currPairwise, i, counts[i])
+            if isBeaten(nextPairwise, cand, winner):
+
+                # Find the smallest number of copies of the current preference that suffices.
+                low, high = 1, int(counts[i])
+                while low < high:
+                    mid = (low + high)//2
+                    if isBeaten(changeVotes(currPairwise, i, mid), cand, winner):
+                        high = mid
+                    else:
+                        low = mid + 1
+                votesNeeded += low
+                mov = min(mov, votesNeeded)
+                break
+            votesNeeded += counts[i]
+            currPairwise = nextPairwise
+
+            # If we already need more votes than for some other challenger, we can stop trying.
+            if votesNeeded >= mov:
+                break
+
+    return int(mov)
+
+def movCopeland(profile, alpha = 0.5):
+    """
+    Returns an integer that is an upper bound on the margin of victory, that is, the number of votes
+    needed to be changed so that the winner is no longer the unique winner when using the Copeland
+    rule. The bound is computed greedily from the pairwise count matrix and is achieved by an
+    explicit change of votes. If the profile already results in a draw, the margin is 0.
+
+    :ivar Profile profile: A Profile object that represents an election profile.
+    :ivar float alpha: The score a candidate recieves for each pairwise tie.
+    """
+
+    # Currently, we expect the profile to contain complete ordering over candidates.
+    elecType = profile.getElecType()
+    if elecType != "soc" and elecType != "toc":
+        print("ERROR: unsupported election type")
+        exit()
+
+    cands, positions, counts = getPositionMatrix(profile)
+    pairwise = getPairwiseCountMatrix(positions, counts)
+
+    # If the profile already results in a draw, no vote needs to be changed.
+    scores = copelandScores(pairwise, alpha)
+    winners = np.flatnonzero(scores == scores.max())
+    if len(winners) > 1:
+        return 0
+
+    def isBeaten(currPairwise, cand, winner):
+        scores = copelandScores(currPairwise, alpha)
+        return (scores >= scores[winner]).sum() > 1
+
+    return movPairwiseGreedy(positions, counts, pairwise, winners[0], isBeaten)
+
+def movMaximin(profile):
+    """
+    Returns an integer that is an upper bound on the margin of victory, that is, the number of votes
+    needed to be changed so that the winner is no longer the unique winner when using the maximin
+    rule. The bound is computed greedily from the pairwise count matrix and is achieved by an
+    explicit change of votes. If the profile already results in a draw, the margin is 0.
+
+    :ivar Profile profile: A Profile object that represents an election profile.
+    """
+
+    # Currently, we expect the profile to contain complete ordering over candidates.
+    elecType = profile.getElecType()
+    if elecType != "soc" and elecType != "toc":
+        print("ERROR: unsupported election type")
+        exit()
+
+    cands, positions, counts = getPositionMatrix(profile)
+    pairwise = getPairwiseCountMatrix(positions, counts)
+
+    # If the profile already results in a draw, no vote needs to be changed.
+    scores = maximinScores(pairwise)
+    winners = np.flatnonzero(scores == scores.max())
+    if len(winners) > 1:
+        return 0
+
+    def isBeaten(currPairwise, cand, winner):
+        scores = maximinScores(currPairwise)
+        return (scores >= scores[winner]).sum() > 1
+
+    return movPairwiseGreedy(positions, counts, pairwise, winners[0], isBeaten)
+
+def movSchulze(profile):
+    """
+    Returns an integer that is an upper bound on the margin of victory, that is, the number of votes
+    needed to be changed so that the winner is no longer the unique winner when using the Schulze
+    rule. The bound is computed greedily from the pairwise count matrix and is achieved by an
+    explicit change of votes. If the profile already results in a draw, the margin is 0.
+
+    :ivar Profile profile: A Profile object that represents an election profile.
+    """
+
+    # Currently, we expect the profile to contain complete ordering over candidates.
+    elecType = profile.getElecType()
+    if elecType != "soc" and elecType != "toc":
+        print("ERROR: unsupported election type")
+        exit()
+
+    cands, positions, counts = getPositionMatrix(profile)
+    pairwise = getPairwiseCountMatrix(positions, counts)
+
+    # If the profile already results in a draw, no vote needs to be changed.
+    scores = schulzeScores(pairwise)
+    winners = np.flatnonzero(scores == scores.max())
+    if len(winners) > 1:
+        return 0
 
+    def isBeaten(currPairwise, cand, winner):
+        scores = schulzeScores(currPairwise)
+        return (scores >= scores[winner]).sum() > 1
 
+    return movPairwiseGreedy(positions, counts, pairwise, winners[0], isBeaten)
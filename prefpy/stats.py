@@ -17,6 +17,7 @@
 #####################################################
 
 import numpy as np
+import scipy.stats
 
 
 def mse(mean, estimator):
@@ -105,3 +106,105 @@ def mix2PL_wsse(mean, estimator, m):
     estimator = np.hstack((1 - estimator[0], estimator[m+1:], estimator[1:m+1]))
     wsse2 = wsse(mean, estimator, m)
     return min(wsse1, wsse2)
+
+def split_chains(draws):
+    """
+    Description:
+        Splits each of a set of Markov chains into its
+        first and second halves, dropping the middle
+        sample of chains of odd length.
+    Parameters:
+        draws: samples of one or more parameters with
+               shape (chains, samples) or
+               (chains, samples, parameters) (numpy ndarray)
+    """
+    draws = np.asarray(draws, dtype=float)
+    half = draws.shape[1] // 2
+    return np.concatenate((draws[:, :half], draws[:, draws.shape[1] - half:]), axis=0)
+
+def split_rhat(draws):
+    """
+    Description:
+        Calculates the split potential scale reduction
+        factor (split R-hat) of each parameter sampled by
+        a set of Markov chains. Values close to 1 indicate
+        that the chains have mixed. A parameter that is
+        constant across all chains has an R-hat of 1.
+    Parameters:
+        draws: samples of one or more parameters with
+               shape (chains, samples) or
+               (chains, samples, parameters) and at
+               least 4 samples per chain (numpy ndarray)
+    """
+    draws = split_chains(draws)
+    n = draws.shape[1]
+    within = np.mean(np.var(draws, axis=1, ddof=1), axis=0)
+    between = np.var(np.mean(draws, axis=1), axis=0, ddof=1)
+    var_plus = (n - 1.0) / n * within + between
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rhat = np.sqrt(var_plus / within)
+    rhat = np.where(within > 0, rhat, np.where(between > 0, np.inf, 1.0))
+    return rhat
+
+def ess(draws):
+    """
+    Description:
+        Calculates the effective sample size (ESS) of
+        each parameter sampled by a set of Markov chains,
+        from the autocorrelations of the split chains
+        truncated by Geyer's initial monotone sequence.
+        A parameter that is constant across all chains has
+        an ESS equal to the total number of samples.
+    Parameters:
+        draws: samples of one or more parameters with
+               shape (chains, samples) or
+               (chains, samples, parameters) and at
+               least 4 samples per chain (numpy ndarray)
+    """
+    draws = split_chains(draws)
+    chains, n = draws.shape[:2]
+
+    # autocovariance of every chain, computed with the FFT
+    centered = draws - np.mean(draws, axis=1, keepdims=True)
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    transform = np.fft.rfft(centered, n=size, axis=1)
+    acov = np.fft.irfft(transform * np.conj(transform), n=size, axis=1)[:, :n] / n
+
+    within = np.mean(acov[:, 0] * n / (n - 1.0), axis=0)
+    var_plus = (n - 1.0) / n * within
+    if chains > 1:
+        var_plus = var_plus + np.var(np.mean(draws, axis=1), axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rho = 1 - (within - np.mean(acov, axis=0)) / var_plus
+    rho[0] = 1
+
+    # sums of consecutive pairs of autocorrelations, kept while
+    # they are positive and forced to be non-increasing
+    pairs = rho[:n - n % 2].reshape((n // 2, 2) + rho.shape[1:]).sum(axis=1)
+    positive = np.cumprod(pairs > 0, axis=0).astype(bool)
+    pairs = np.minimum.accumulate(np.where(positive, pairs, 0), axis=0)
+    tau = np.maximum(-1 + 2 * np.sum(pairs, axis=0), 1.0 / np.log10(chains * n))
+    return np.where(var_plus > 0, chains * n / tau, chains * n)
+
+def batch_means_interval(batch_means, confidence):
+    """
+    Description:
+        Calculates the mean of one or more parameters and
+        the half-width of its confidence interval from the
+        means of consecutive, equally sized batches of
+        samples of a Markov chain, using the quantile of
+        Student's t distribution with one less degree of
+        freedom than the number of batches.
+    Parameters:
+        batch_means: means of the batches with shape
+                     (batches,) or (batches, parameters)
+                     and at least 2 batches (numpy ndarray)
+        confidence:  confidence level of the interval,
+                     between 0 and 1 (float)
+    """
+    batch_means = np.asarray(batch_means, dtype=float)
+    batches = batch_means.shape[0]
+    mean = np.mean(batch_means, axis=0)
+    stderr = np.std(batch_means, axis=0, ddof=1) / np.sqrt(batches)
+    quantile = scipy.stats.t.ppf(0.5 + confidence / 2.0, batches - 1)
+    return mean, quantile * stderr
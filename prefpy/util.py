@@ -3,6 +3,8 @@
 # Date: 10/4/2015
 # Description: Miscellaneous utility functions
 
+import numpy as np
+
 def get_index_nested(x, i):
     """
     Description:
@@ -15,3 +17,72 @@ def get_index_nested(x, i):
         if i == x[ind]:
             return ind
     return -1 # not found
+
+def get_positions(rankings, alts):
+    """
+    Description:
+        Returns a two-dimensional array with the index in each
+        ranking of each alternative, as given by get_index_nested,
+        so -1 marks an alternative missing from a ranking. Rankings
+        that are all permutations of the alternatives are converted
+        at once with an argsort.
+    Parameters:
+        rankings: set of rankings (list of one-dimensional arrays
+                  or two-dimensional numpy array)
+        alts:     list of the alternatives, in the order of the
+                  columns of the result
+    """
+    positions = np.full((len(rankings), len(alts)), -1, dtype=int)
+    if len(rankings) == 0:
+        return positions
+
+    try:
+        array = np.asarray(rankings)
+    except ValueError: # rankings of different lengths
+        array = None
+    alts_array = np.asarray(alts)
+    if (array is not None and array.ndim == 2 and array.shape[1] == len(alts)
+            and array.dtype.kind in "iuf" and alts_array.dtype.kind in "iuf"):
+        order = np.argsort(alts_array, kind="mergesort")
+        found = np.searchsorted(alts_array[order], array).clip(0, len(alts) - 1)
+        indices = order[found]
+        if (np.all(alts_array[indices] == array) and
+                np.all(np.sort(indices, axis=1) == np.arange(len(alts)))):
+            positions[np.arange(len(array))[:, None], indices] = np.arange(len(alts))
+            return positions
+
+    alt_index = {alt: ind for ind, alt in enumerate(alts)}
+    for row, ranking in enumerate(rankings):
+        # walk backwards so the first index of an alternative is kept
+        for pos in range(len(ranking) - 1, -1, -1):
+            try:
+                ind = alt_index.get(ranking[pos])
+            except TypeError: # unhashable entries match no alternative
+                continue
+            if ind is not None:
+                positions[row][ind] = pos
+    return positions
+
+def get_pairwise_counts(positions, block_size=None):
+    """
+    Description:
+        Returns the matrix whose entry (i, j) is the number of
+        rankings in which alternative i has a smaller index than
+        alternative j. Alternatives missing from a ranking are not
+        counted. The rankings are compared in blocks so that each
+        block uses about 16 million comparisons.
+    Parameters:
+        positions:  index of each alternative in each ranking, as
+                    returned by get_positions (numpy ndarray)
+        block_size: number of rankings compared at a time (int)
+    """
+    n, m = positions.shape
+    if block_size is None:
+        block_size = max(1, 2**24 // max(1, m * m))
+    counts = np.zeros((m, m))
+    for start in range(0, n, block_size):
+        block = positions[start:start + block_size]
+        above = ((block[:, :, None] < block[:, None, :]) &
+                 (block[:, :, None] >= 0))
+        counts += np.sum(above, axis=0)
+    return counts
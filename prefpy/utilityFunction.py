@@ -36,6 +36,58 @@ class UtilityFunction():
             exit()
         return utility
 
+    def getUtilitiesBySize(self, numCands):
+        """
+        Returns a list whose s-th entry is the utility of deciding on a single candidate when s
+        candidates, including that candidate, reach it in a binary relation, or None if the
+        utility does not depend only on that number. By default, it returns None.
+
+        :ivar int numCands: The number of candidates.
+        """
+
+        return None
+
+    def getUtilitiesBatch(self, positions, cands):
+        """
+        Returns a two-dimensional numpy array that contains, for each of several rankings, the
+        utility of the decision that consists of each candidate alone. By default, each ranking
+        is rebuilt and getUtility() is called for each candidate; child classes may compute the
+        whole array at once.
+
+        :ivar numpy.ndarray positions: A two-dimensional array with one row per ranking, such that
+            positions[s][k] is the position of cands[k] in ranking s, starting from 0.
+        :ivar list<int> cands: Contains integer representations of each candidate, in the order
+            of the columns of positions.
+        """
+
+        utilities = numpy.zeros(positions.shape)
+        for s in range(0, len(positions)):
+            orderVector = [cands[k] for k in numpy.argsort(positions[s])]
+            for k in range(0, len(cands)):
+                utilities[s][k] = self.getUtility([cands[k]], orderVector)
+        return utilities
+
+    def getUtilitiesBatchRelations(self, binaryRelations, cands):
+        """
+        Returns a two-dimensional numpy array that contains, for each of several binary
+        relations, the utility of the decision that consists of each candidate alone. By default,
+        getUtility() is called for each relation and candidate; child classes may compute the
+        whole array at once.
+
+        :ivar numpy.ndarray binaryRelations: A three-dimensional array with one binary relation
+            per sample, such that binaryRelations[s][cand1-1][cand2-1] is nonzero if cand1 is
+            ranked above cand2 in sample s.
+        :ivar list<int> cands: Contains integer representations of each candidate, in the order
+            of the columns of the returned array.
+        """
+
+        utilities = numpy.zeros((len(binaryRelations), len(cands)))
+        for s in range(0, len(binaryRelations)):
+            binaryRelation = binaryRelations[s].astype(int).tolist()
+            for k in range(0, len(cands)):
+                utilities[s][k] = self.getUtility([cands[k]], binaryRelation)
+        return utilities
+
 class UtilityFunctionMallowsPosScoring(UtilityFunction):
     """
     The positional scoring utility function for the Mallows model. By default, this will be 
@@ -76,6 +128,24 @@ class UtilityFunctionMallowsPosScoring(UtilityFunction):
             utilities.append(utility)
         return utilities
 
+    def getUtilitiesBatch(self, positions, cands):
+        """
+        Returns a two-dimensional numpy array that contains, for each of several rankings, the
+        utility of the decision that consists of each candidate alone, by indexing the scoring
+        vector with the positions of all candidates in all rankings at once.
+
+        :ivar numpy.ndarray positions: A two-dimensional array with one row per ranking, such that
+            positions[s][k] is the position of cands[k] in ranking s, starting from 0.
+        :ivar list<int> cands: Contains integer representations of each candidate, in the order
+            of the columns of positions.
+        """
+
+        scoringVector = numpy.asarray(self.getScoringVector(cands), dtype=float)
+        utilities = scoringVector[positions]
+        if self.isLoss == True:
+            utilities = -1*utilities
+        return utilities
+
 class UtilityFunctionMallowsTopK(UtilityFunctionMallowsPosScoring):
     """
     The top-k utility function for the Mallows model. By default, this will be constructed as a 
@@ -137,6 +207,85 @@ class UtilityFunctionCondorcetTopK(UtilityFunction):
         self.k = k
         self.isLoss = False
 
+    def getUtilitiesBySize(self, numCands):
+        """
+        Returns a list whose s-th entry is the utility of deciding on a single candidate when s
+        candidates, including that candidate, reach it in a binary relation. The candidate is in
+        the top k exactly when s is at most k.
+
+        :ivar int numCands: The number of candidates.
+        """
+
+        utilities = [0.0]
+        for size in range(1, numCands+1):
+            if size > self.k:
+                utilities.append(0.0)
+            elif self.isLoss == False:
+                utilities.append(1.0)
+            else:
+                utilities.append(-1.0)
+        return utilities
+
+    def getTopSetSizes(self, binaryRelations):
+        """
+        Returns a two-dimensional numpy array that contains, for each of several binary relations
+        and each candidate, the number of candidates, including itself, that reach the candidate.
+
+        When every relation is a tournament, its strongly connected components are ordered, and
+        the candidates that reach a candidate are those in its component and in every component
+        above it. After sorting the candidates by their number of wins, the first t candidates
+        beat all others exactly when their wins add up to t(t-1)/2 + t(m-t), so each count is
+        the first such t that includes the candidate. Otherwise, reachability is computed by
+        squaring the adjacency matrices until they stop changing.
+
+        :ivar numpy.ndarray binaryRelations: A three-dimensional array with one binary relation
+            per sample, such that binaryRelations[s][cand1-1][cand2-1] is nonzero if cand1 is
+            ranked above cand2 in sample s.
+        """
+
+        adjacency = numpy.asarray(binaryRelations) > 0
+        numSamples, m = adjacency.shape[0], adjacency.shape[1]
+        offDiagonal = ~numpy.eye(m, dtype=bool)
+        isTournament = numpy.all((adjacency ^ adjacency.transpose(0, 2, 1))[:, offDiagonal]) and \
+            not numpy.any(adjacency[:, ~offDiagonal])
+
+        if isTournament:
+            wins = adjacency.sum(axis=2)
+            order = numpy.argsort(-wins, axis=1, kind="mergesort")
+            sortedWins = wins[numpy.arange(numSamples)[:, None], order]
+            t = numpy.arange(1, m+1)
+            isBoundary = numpy.cumsum(sortedWins, axis=1) == t*(t-1)//2 + t*(m-t)
+            boundaries = numpy.where(isBoundary, t, m)
+            nextBoundaries = numpy.minimum.accumulate(boundaries[:, ::-1], axis=1)[:, ::-1]
+            sizes = numpy.zeros((numSamples, m), dtype=int)
+            sizes[numpy.arange(numSamples)[:, None], order] = nextBoundaries
+            return sizes
+
+        reach = adjacency | ~offDiagonal
+        while True:
+            nextReach = numpy.matmul(reach.astype(numpy.int32), reach.astype(numpy.int32)) > 0
+            if numpy.array_equal(nextReach, reach):
+                break
+            reach = nextReach
+        return reach.sum(axis=1)
+
+    def getUtilitiesBatchRelations(self, binaryRelations, cands):
+        """
+        Returns a two-dimensional numpy array that contains, for each of several binary
+        relations, the utility of the decision that consists of each candidate alone, computed
+        for all relations and candidates at once.
+
+        :ivar numpy.ndarray binaryRelations: A three-dimensional array with one binary relation
+            per sample, such that binaryRelations[s][cand1-1][cand2-1] is nonzero if cand1 is
+            ranked above cand2 in sample s.
+        :ivar list<int> cands: Contains integer representations of each candidate, in the order
+            of the columns of the returned array.
+        """
+
+        sizes = self.getTopSetSizes(binaryRelations)
+        sizeUtilities = numpy.asarray(self.getUtilitiesBySize(sizes.shape[1]))
+        return sizeUtilities[sizes[:, numpy.asarray(cands) - 1]]
+
     def getUtilities(self, decision, binaryRelations):
         """
         Returns a floats that contains the utilities of every candidate in the decision. This was 
@@ -150,25 +299,5 @@ class UtilityFunctionCondorcetTopK(UtilityFunction):
             and 0 otherwise.
         """
 
-        m = len(binaryRelations)
-        utilities = []
-        for cand in decision:
-            tops = [cand-1]
-            index = 0
-            while index < len(tops):
-                s = tops[index]
-                for j in range(m):
-                    if j == s:
-                        continue
-                    if binaryRelations[j][s] > 0:
-                        if j not in tops:
-                            tops.append(j)
-                index += 1
-            if len(tops) <= self.k:
-                if self.isLoss == False:
-                    utilities.append(1.0)
-                elif self.isLoss == True:
-                    utilities.append(-1.0)
-            else:
-                utilities.append(0.0)
-        return utilities
+        utilities = self.getUtilitiesBatchRelations(numpy.array([binaryRelations]), decision)
+        return utilities[0].tolist()